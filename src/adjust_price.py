@@ -1,13 +1,32 @@
 import re
-from constants import NIFTY_FIFTY_TABLE, TRADE_DATE, logger, APPLIED_ACTIONS_LOG, DUCKDB_PATH, SYMBOL, TRADE_DATE, NIFTY_FIFTY_TABLE
+from constants import (NIFTY_FIFTY_TABLE, TRADE_DATE, logger, APPLIED_ACTIONS_LOG, DUCKDB_PATH, SYMBOL, TRADE_DATE,
+                       NIFTY_FIFTY_TABLE, ADJUSTMENT_FACTORS_TABLE, ADJUSTED_VIEW_SUFFIX,
+                       AUTO_APPROVE_ACTION_TYPES, AUTO_APPROVE_FACTOR_RANGE, SUPPORTED_WEEKS)
 from datetime import datetime
-from duckdb_manager import DuckDBManager
+import numpy as np
+import pandas as pd
+from duckdb_manager import DuckDBManager, run_in_transaction
+from nifty_fifty_stocks import NiftyFiftyStocks
 
 class GeneralMeeting():
-    def __init__(self, con):
+    SPLIT_FROM = re.compile(r"(?:FROM\s+)?\bR(?:S|E)\.?\s*(\d+(?:\.\d+)?)")
+    SPLIT_TO = re.compile(r"\bTO\s+R(?:S|E)\.?\s*(\d+(?:\.\d+)?)")
+    BONUS = re.compile(r"\bBONUS(?:\s+DEBENTURES)?\s+(\d+)\s*:\s*(\d+)")
+    RIGHTS = re.compile(r"\bRIGHTS(?:-EQ)?\s*(\d+)\s*:\s*(\d+)")
+    RIGHTS_PRICE = re.compile(r"(?:@PREM|@PREMIUM|@ PREMIUM)?\s*\bR(?:S|E)\.?\s*(\d+(?:\.\d+)?)")
+    BLENDED_RIGHTS = re.compile(r"(\d+):(\d+).*?@.*?RS\s*(\d+(?:\.\d+)?)")
+
+    def __init__(self, con, table=NIFTY_FIFTY_TABLE):
+        """
+        `table` is the price table actions are checked and adjusted against: nifty_fifty,
+        stocks or any table with the stocks columns. adjustment_factors is shared by all of them.
+        """
         self.con = con
+        self.table = table
         self.price_columns = ["OPEN", "HIGH", "LOW", "CLOSE", "LAST", "PREVCLOSE"]
         self._init_actions_log_table()
+        self._init_adjustment_factors_table()
+        self.create_adjusted_view()
 
     def _init_actions_log_table(self):
         """
@@ -28,6 +47,113 @@ class GeneralMeeting():
         print(f"Ensured '{APPLIED_ACTIONS_LOG}' table exists.")
 
 
+    def _init_adjustment_factors_table(self):
+        """
+        Applied actions are kept as price factors instead of being multiplied into the
+        stored prices: prices of a symbol before exec_date are scaled by factor in
+        the adjusted view, raw prices are never changed.
+        """
+        create_factors_table_query = f"""
+        CREATE TABLE IF NOT EXISTS {ADJUSTMENT_FACTORS_TABLE} (
+            symbol VARCHAR,
+            exec_date DATE,
+            factor DOUBLE,
+            PRIMARY KEY (symbol, exec_date)
+        );
+        """
+        self.con.execute(create_factors_table_query)
+        print(f"Ensured '{ADJUSTMENT_FACTORS_TABLE}' table exists.")
+
+    def adjusted_query(self, table=None, symbols=None):
+        """
+        `table` (default: the GeneralMeeting's table) with its price columns multiplied by the
+        product of the factors of all actions executed after each row's trade date, found with
+        an ASOF join on the cumulative product of the symbol's factors (latest action first).
+        Adds an adjustment_factor column. symbols=[...] keeps only those symbols.
+        Both sides are sorted once, so the cost grows with actions plus rows, not their product.
+        """
+        table = table or self.table
+        symbol_filter = ""
+        if symbols is not None:
+            listed = ", ".join("'" + symbol.replace("'", "''") + "'" for symbol in symbols)
+            symbol_filter = f"WHERE t.{SYMBOL} IN ({listed or 'NULL'})"
+        replace_clauses = ", ".join(
+            [f"t.{col.lower()} * COALESCE(f.cum_factor, 1) AS {col.lower()}" for col in self.price_columns]
+        )
+        return f"""
+            WITH cumulative_factors AS (
+                SELECT symbol, exec_date,
+                       PRODUCT(factor) OVER (PARTITION BY symbol ORDER BY exec_date DESC) AS cum_factor
+                FROM {ADJUSTMENT_FACTORS_TABLE}
+            )
+            SELECT t.* REPLACE ({replace_clauses}),
+                   COALESCE(f.cum_factor, 1) AS adjustment_factor
+            FROM {table} t
+            ASOF LEFT JOIN cumulative_factors f
+                ON t.{SYMBOL} = f.symbol AND t.{TRADE_DATE} < f.exec_date
+            {symbol_filter}
+        """
+
+    def create_adjusted_view(self, table=None, materialize=False, symbols=None, name=None):
+        """
+        Create <table>_adjusted (or `name`) over adjusted_query, as a view by default, always
+        up to date with the factors, or as a table with materialize=True for repeated heavy reads.
+        """
+        table = table or self.table
+        exists = self.con.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [table]
+        ).fetchone()[0]
+        if not exists:
+            logger.info(f"{table} does not exist yet, not creating its adjusted view")
+            return
+        name = name or f"{table}{ADJUSTED_VIEW_SUFFIX}"
+        query = self.adjusted_query(table, symbols)
+        # CREATE OR REPLACE cannot turn a view into a table or back, and DROP ... IF EXISTS
+        # fails when the name is taken by the other kind
+        if materialize:
+            if self.con.execute("SELECT COUNT(*) FROM duckdb_views() WHERE view_name = ?", [name]).fetchone()[0]:
+                self.con.execute(f"DROP VIEW {name}")
+            self.con.execute(f"CREATE OR REPLACE TABLE {name} AS {query}")
+        else:
+            if self.con.execute("SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [name]).fetchone()[0]:
+                self.con.execute(f"DROP TABLE {name}")
+            self.con.execute(f"CREATE OR REPLACE VIEW {name} AS {query}")
+        print(f"Ensured '{name}' {'table' if materialize else 'view'} exists.")
+
+    def reset_highs_and_lows(self, symbols):
+        """
+        Clear the week highs and lows of `symbols` in nifty_fifty. They are computed from
+        nifty_fifty_adjusted, so a new factor changes them; the next
+        NiftyFiftyStocks.update_highs_and_lows(_incremental) recomputes these symbols in full.
+        """
+        exists = self.con.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [NIFTY_FIFTY_TABLE]
+        ).fetchone()[0]
+        if not exists or not symbols:
+            return
+        columns = [col for w in SUPPORTED_WEEKS for col in NiftyFiftyStocks.high_low_columns(w)]
+        self.con.execute(f"""
+            UPDATE {NIFTY_FIFTY_TABLE}
+            SET {", ".join([f"{col} = NULL" for col in columns])}
+            WHERE {SYMBOL} IN (SELECT UNNEST(?::VARCHAR[]))
+        """, [list(symbols)])
+
+    def factors_from_log(self):
+        """
+        Rebuild adjustment_factors from applied_actions_log, for databases whose actions were
+        multiplied into the stored prices: reload the raw prices first (e.g. delete the rows of
+        nifty_fifty and resync them from stocks), then call this.
+        """
+        self.con.execute(f"DELETE FROM {ADJUSTMENT_FACTORS_TABLE}")
+        self.con.execute(f"""
+            INSERT INTO {ADJUSTMENT_FACTORS_TABLE} (symbol, exec_date, factor)
+            SELECT symbol, exec_date, PRODUCT(adjustment_factor)
+            FROM {APPLIED_ACTIONS_LOG}
+            GROUP BY symbol, exec_date
+        """)
+        symbols = self.con.execute(f"SELECT DISTINCT symbol FROM {ADJUSTMENT_FACTORS_TABLE}").fetchall()
+        self.reset_highs_and_lows([symbol for (symbol,) in symbols])
+
     def _log_action(self, action):
         """Logs the details of an applied action to the log table."""
         log_query = f"""
@@ -40,96 +166,25 @@ class GeneralMeeting():
         print(f"Logged action for {action['symbol']} on {action['exec_date']}.")
 
 
-    def get_ratio_and_exec_date(self, symbol: str, exec_date: str, purpose: str):
-        final_resp = dict()
-        purpose = purpose.strip().upper()
-
-        if "FACE VALUE SPLIT" in purpose:
-            from_match = re.search(
-            r"(?:FROM\s+)?R(?:S|E)\.?\s*(\d+(?:\.\d+)?)", purpose, flags=re.IGNORECASE
-            )
-            to_match = re.search(
-                r"TO\s+R(?:S|E)\.?\s*(\d+(?:\.\d+)?)", purpose, flags=re.IGNORECASE
-            )
-            if from_match and to_match:
-                from_price = float(from_match.group(1))
-                to_price = float(to_match.group(1))
-                final_resp['face_split'] = f"{from_price}:{to_price}"
-                final_resp['split_factor'] = to_price / from_price
-            
-            else:
-                print(f"Unable to find the split values -> {purpose}")
-        
-        if "BONUS" in purpose:
-            bonus_match = re.search(r"BONUS(?:\s+DEBENTURES)?\s+(\d+)\s*:\s*(\d+)", purpose)
-            if bonus_match:
-                new_shares = int(bonus_match.group(1))
-                old_shares = int(bonus_match.group(2))
-                bonus_ratio = f"{new_shares}:{old_shares}"
-                final_resp['bonus'] = bonus_ratio
-                final_resp['bonus_factor'] = old_shares / (old_shares + new_shares)
-            else:
-                print(f"Unable to find the bonus ratio -> {purpose}")
-
-        if "RIGHTS" in purpose:
-            query = f"SELECT close FROM {NIFTY_FIFTY_TABLE} WHERE {SYMBOL} = ? AND {TRADE_DATE} < ? ORDER BY {TRADE_DATE} DESC LIMIT 1"
-            result = self.con.execute(query, [symbol, exec_date]).fetchone()
-            if not result:
-                print(f"Unable to fetch price previous to {exec_date} for {symbol} -> {purpose}")
-                return None
-
-            right_match = re.search(r"RIGHTS(?:-EQ)?\s*(\d+)\s*:\s*(\d+)", purpose)
-            price_match = re.search(r"(?:@PREM|@PREMIUM|@ PREMIUM)?\s*R(?:S|E)\.?\s*(\d+(?:\.\d+)?)", purpose, flags=re.IGNORECASE)
-            
-            if right_match and price_match:
-                right_ratio = f"{right_match.group(1)}:{right_match.group(2)}"
-                final_resp['rights'] = right_ratio
-                rights_price = float(price_match.group(1))
-                final_resp["rights_price"] = rights_price
-
-                if not rights_price or not right_ratio:
-                    print(f"Unable to fetch price previous to {exec_date} for {symbol} -> {purpose}")
-                    return None
-
-                cum_rights_price = result[0]
-
-                if cum_rights_price == 0:
-                    print(f"Warning: Prior closing price for {symbol} is zero. Skipping rights adjustment.")
-                    return None
-
-                final_resp['last_day_stock_price_from_exec_date'] = cum_rights_price
-                new_shares, old_shares = map(int, right_ratio.split(':'))
-                ex_rights_price = ((cum_rights_price * old_shares) + (rights_price * new_shares)) / (old_shares + new_shares)
-                final_resp['rights_factor'] = ex_rights_price / cum_rights_price
-            else:
-                self.get_blended_rights(purpose, final_resp, result)
-        
-        final_resp['exec_date'] = exec_date
-        final_resp['symbol'] = symbol
-        return final_resp
-    
-    def get_blended_rights(self, purpose, final_resp, result):
-        pattern = r"(\d+):(\d+).*?@.*?RS\s*(\d+(?:\.\d+)?)"
-        matches = re.findall(pattern, purpose)
-        if not matches:
-            print(f"Could not parse the complex rights issue -> {purpose}")
-            return None
-        else:
-            rights_issues = []
-            blended_rights = []
-            for match in matches:
-                rights_issues.append({
-                    'new_shares': int(match[0]),
-                    'old_shares_basis': int(match[1]), # The 'B' in A:B
-                    'price': float(match[2])
-                })
-            for rights_issue in rights_issues:
-                blended_rights.append(f"{rights_issue['new_shares']}:{rights_issue['old_shares_basis']} at {rights_issue['price']}")
-
-            cum_rights_price = result[0]
-            final_resp['blended_rights'] = ", ".join(blended_rights)
-            final_resp['blended_rights_factor'] = self.calculate_blended_rights_factor(rights_issues, cum_rights_price)
-            final_resp['last_day_stock_price_from_exec_date'] = cum_rights_price
+    def previous_closes(self, pairs):
+        """
+        {(symbol, exec_date): close of the symbol's last trading day before exec_date} for
+        (symbol, 'YYYY-MM-DD') pairs, resolved with one ASOF join instead of a query per pair.
+        """
+        pairs = pd.DataFrame(sorted(set(pairs)), columns=["symbol", "exec_date"])
+        if pairs.empty:
+            return dict()
+        self.con.register("rights_exec_dates", pairs)
+        try:
+            rows = self.con.execute(f"""
+                SELECT p.symbol, p.exec_date, t.close
+                FROM rights_exec_dates p
+                ASOF JOIN {self.table} t
+                    ON p.symbol = t.{SYMBOL} AND p.exec_date::DATE > t.{TRADE_DATE}
+            """).fetchall()
+        finally:
+            self.con.unregister("rights_exec_dates")
+        return {(symbol, exec_date): close for symbol, exec_date, close in rows}
 
     def calculate_blended_rights_factor(self, rights_issues, cum_rights_price):
         def lcm(a, b):
@@ -176,44 +231,141 @@ class GeneralMeeting():
         
         return adjustment_factor
     
-    def get_exec_date(self, ex_date: str):
-        try:
-            ex_date = ex_date.strip().replace('"', '')
-            date_obj = datetime.strptime(ex_date, "%d-%b-%Y")
-            return date_obj.strftime("%Y-%m-%d")
-        except Exception as e:
-            logger.info(f"Unable to parse date {ex_date}")
-        
-
-    def get_split_or_bonus_details(self, csv_line: str):
-
-        splitted_lines = csv_line.split(",")
-        
-        symbol = splitted_lines[0].replace('"', '')
-        purpose = splitted_lines[3]
-        ex_date = self.get_exec_date(splitted_lines[5])
-        split_details = self.get_ratio_and_exec_date(symbol, ex_date, purpose)
-        if not split_details or not ex_date or not symbol:
-            return False
-
-        return split_details
+    def parse_purposes(self, purposes):
+        """
+        Split, bonus and rights terms of each distinct purpose, one row per purpose
+        (indexed by it), matched with the precompiled patterns over the whole column.
+        """
+        purposes = pd.Series(pd.unique(purposes), dtype=object)
+        text = purposes.str.strip().str.upper()
+        parsed = pd.DataFrame({"purpose": purposes})
+
+        parsed["is_split"] = text.str.contains("FACE VALUE SPLIT", regex=False)
+        split_from = text.str.extract(self.SPLIT_FROM)[0].astype(float)
+        split_to = text.str.extract(self.SPLIT_TO)[0].astype(float)
+        parsed["split_from"] = split_from.where(parsed["is_split"])
+        parsed["split_to"] = split_to.where(parsed["is_split"])
+
+        parsed["is_bonus"] = text.str.contains("BONUS", regex=False)
+        bonus = text.str.extract(self.BONUS).astype(float)
+        parsed["bonus_new"] = bonus[0].where(parsed["is_bonus"])
+        parsed["bonus_old"] = bonus[1].where(parsed["is_bonus"])
+
+        parsed["is_rights"] = text.str.contains("RIGHTS", regex=False)
+        rights = text.str.extract(self.RIGHTS)
+        rights_price = text.str.extract(self.RIGHTS_PRICE)[0].astype(float)
+        parsed["rights_new"] = rights[0].astype(float).where(parsed["is_rights"])
+        parsed["rights_old"] = rights[1].astype(float).where(parsed["is_rights"])
+        parsed["rights_price"] = rights_price.where(parsed["is_rights"])
+        # offers like "1:2 @ RS 50 AND 1:3 @ RS 80", used when the simple pattern does not match
+        blended = text.str.findall(self.BLENDED_RIGHTS)
+        simple = parsed["rights_new"].notna() & parsed["rights_price"].notna()
+        parsed["blended_offers"] = blended.where(parsed["is_rights"] & ~simple)
+
+        for label, failed in [
+            ("split values", parsed["is_split"] & (parsed["split_from"].isna() | parsed["split_to"].isna())),
+            ("bonus ratio", parsed["is_bonus"] & (parsed["bonus_new"].isna() | parsed["bonus_old"].isna())),
+            ("rights terms", parsed["blended_offers"].str.len() == 0),
+        ]:
+            for purpose in purposes[failed]:
+                print(f"Unable to find the {label} -> {purpose}")
+        return parsed.set_index("purpose")
+
+    def read_actions(self, file_path):
+        """
+        Corporate actions of an NSE action file as a typed table, one row per action line
+        with a split, bonus or rights factor: symbol, exec_date, purpose, the parsed terms
+        and split_factor, bonus_factor, rights_factor, blended_rights_factor.
 
+        The file is read with a CSV reader (quoted fields may contain commas), each distinct
+        purpose is parsed once (see parse_purposes), and the closes before the exec dates
+        of rights issues come from one ASOF join (see previous_closes).
+        """
+        raw = pd.read_csv(file_path, dtype=object, keep_default_na=False, skipinitialspace=True,
+                          usecols=[0, 3, 5])
+        raw.columns = ["symbol", "purpose", "exec_date"]
+        parsed = self.parse_purposes(raw["purpose"])
+        actions = raw.join(parsed, on="purpose")
+        # only splits, bonuses and rights are adjustments, most lines (dividends, meetings) are not
+        actions = actions[actions["is_split"] | actions["is_bonus"] | actions["is_rights"]]
+
+        # ex-dates repeat across lines too, each distinct one is parsed once
+        ex_dates = actions["exec_date"].str.strip()
+        distinct_dates = pd.unique(ex_dates)
+        parsed_dates = pd.Series(pd.to_datetime(distinct_dates, format="%d-%b-%Y", errors="coerce"),
+                                 index=distinct_dates)
+        actions = actions.assign(symbol=actions["symbol"].str.strip(), exec_date=ex_dates.map(parsed_dates))
+        unparsed = actions["exec_date"].isna()
+        if unparsed.any():
+            logger.info(f"Unable to parse {unparsed.sum()} dates in {file_path}")
+        actions = actions[~unparsed & (actions["symbol"] != "")].reset_index(drop=True)
+
+        actions["split_factor"] = actions["split_to"] / actions["split_from"]
+        actions["bonus_factor"] = actions["bonus_old"] / (actions["bonus_old"] + actions["bonus_new"])
+
+        rights_rows = actions["is_rights"]
+        rights_keys = list(zip(actions["symbol"][rights_rows], actions["exec_date"][rights_rows].dt.strftime("%Y-%m-%d")))
+        previous_closes = self.previous_closes(rights_keys)
+        closes = pd.Series(np.nan, index=actions.index)
+        closes[rights_rows] = [previous_closes.get(key, np.nan) for key in rights_keys]
+        actions["last_day_stock_price_from_exec_date"] = closes
+
+        # rights issues without a usable prior close are dropped entirely, as are free rights issues
+        no_close = rights_rows & (closes.isna() | (closes == 0))
+        for symbol, exec_date, purpose in actions.loc[no_close, ["symbol", "exec_date", "purpose"]].itertuples(index=False):
+            print(f"Unable to fetch price previous to {exec_date:%Y-%m-%d} for {symbol} -> {purpose}")
+        simple = actions["rights_new"].notna() & actions["rights_price"].notna()
+        actions = actions[~no_close & ~(rights_rows & simple & (actions["rights_price"] == 0))].copy()
+        simple = simple[actions.index]
+
+        new_shares, old_shares = actions["rights_new"], actions["rights_old"]
+        cum_rights_price = actions["last_day_stock_price_from_exec_date"]
+        ex_rights_price = (cum_rights_price * old_shares + actions["rights_price"] * new_shares) / (old_shares + new_shares)
+        actions["rights_factor"] = (ex_rights_price / cum_rights_price).where(simple)
+        actions["blended_rights_factor"] = [
+            self.calculate_blended_rights_factor(
+                [{'new_shares': int(new), 'old_shares_basis': int(old), 'price': float(price)}
+                 for new, old, price in offers], close)
+            if isinstance(offers, list) and offers else np.nan
+            for offers, close in zip(actions["blended_offers"], cum_rights_price)
+        ]
+
+        actions["face_split"] = (actions["split_from"].astype(str) + ":" + actions["split_to"].astype(str)) \
+            .where(actions["split_factor"].notna())
+        actions["bonus"] = (actions["bonus_new"].astype("Int64").astype(str) + ":"
+                            + actions["bonus_old"].astype("Int64").astype(str)).where(actions["bonus_factor"].notna())
+        actions["rights"] = (new_shares.astype("Int64").astype(str) + ":"
+                             + old_shares.astype("Int64").astype(str)).where(actions["rights_factor"].notna())
+        actions["blended_rights"] = [
+            ", ".join(f"{int(new)}:{int(old)} at {float(price)}" for new, old, price in offers)
+            if isinstance(offers, list) and offers else None
+            for offers in actions["blended_offers"]
+        ]
+
+        factors = ["split_factor", "bonus_factor", "rights_factor", "blended_rights_factor"]
+        actions = actions[actions[factors].notna().any(axis=1)]
+        return actions[["symbol", "exec_date", "purpose", "face_split", "split_factor", "bonus", "bonus_factor",
+                        "rights", "rights_price", "last_day_stock_price_from_exec_date", "rights_factor",
+                        "blended_rights", "blended_rights_factor"]] \
+            .astype({"symbol": "string", "purpose": "string", "face_split": "string", "bonus": "string",
+                     "rights": "string", "blended_rights": "string"}) \
+            .reset_index(drop=True)
 
     def get_actions_from_csv(self, file_path):
+        """Parsed actions of a file as dicts, the input of process_and_confirm_actions and apply_actions."""
+        actions = self.read_actions(file_path)
         details = []
-        with open(file_path, 'r') as f:
-            for i, line in enumerate(f):
-                if i==0:
-                    continue
-                detail = self.get_split_or_bonus_details(line)
-                if detail and ('rights_factor' in detail or 
-                                'bonus_factor' in detail or 
-                                'split_factor' in detail or 
-                                'blended_rights_factor' in detail):
-                    details.append(detail)
+        for action in actions.to_dict("records"):
+            detail = {key: value for key, value in action.items()
+                      if key != "purpose" and value is not None and value is not pd.NA and value == value}
+            if pd.isna(action["rights_factor"]):
+                detail.pop("rights_price", None)
+            if pd.isna(action["rights_factor"]) and pd.isna(action["blended_rights_factor"]):
+                detail.pop("last_day_stock_price_from_exec_date", None)
+            detail["exec_date"] = f"{action['exec_date']:%Y-%m-%d}"
+            details.append(detail)
         return details
 
-
     def check_if_adjustment_already_done(self, action: dict):
         check_log_query = f"""
                             SELECT 1 FROM {APPLIED_ACTIONS_LOG}
@@ -234,7 +386,7 @@ class GeneralMeeting():
 
 
     def check_if_data_exists(self, action: dict):
-        record_exists_query = f"SELECT * FROM {NIFTY_FIFTY_TABLE} WHERE {SYMBOL} = ? AND {TRADE_DATE} < ?"
+        record_exists_query = f"SELECT * FROM {self.table} WHERE {SYMBOL} = ? AND {TRADE_DATE} < ?"
         record_exists_result = self.con.execute(record_exists_query, [action['symbol'], action['exec_date']]).fetchone()
         return record_exists_result
     
@@ -246,8 +398,8 @@ class GeneralMeeting():
         print(f"Action Type:                      {action['action_type']}")
         print(f"Details:                          {action['action_details']}")
         print(f"Calculated Adjustment Factor:     {action['adjustment_factor']:.6f}")
-        print("This will multiply all historical prices (Open, High, Low, Close, etc.)")
-        print(f"for {action['symbol']} before {action['exec_date']} by the factor above.")
+        print("Adjusted prices (Open, High, Low, Close, etc.) of all historical rows")
+        print(f"for {action['symbol']} before {action['exec_date']} will be multiplied by the factor above.")
         print("="*50)
         
         confirm = input("Do you want to apply this adjustment? (y/n): ").lower().strip()
@@ -255,50 +407,63 @@ class GeneralMeeting():
         return confirm
 
     def update_table(self, action: dict):
+        """Record the action's factor, one row; the adjusted view picks it up, raw prices stay as loaded."""
         print(f"Applying adjustment for {action['symbol']}...")
-        set_clauses = [f"{col.lower()} = {col.lower()} * ?" for col in self.price_columns]
-        update_query = f"UPDATE {NIFTY_FIFTY_TABLE} SET {', '.join(set_clauses)} WHERE {SYMBOL} = ? AND {TRADE_DATE} < ?"
-        params = [action['adjustment_factor']] * len(self.price_columns) + [action['symbol'], action['exec_date']]
+        update_query = f"""
+            INSERT INTO {ADJUSTMENT_FACTORS_TABLE} (symbol, exec_date, factor)
+            VALUES (?, ?, ?)
+            ON CONFLICT (symbol, exec_date) DO UPDATE SET
+                factor = {ADJUSTMENT_FACTORS_TABLE}.factor * excluded.factor
+        """
+        params = [action['symbol'], action['exec_date'], action['adjustment_factor']]
 
-        # Print the update query and parameters before execution
-        print(f"Executing query: {update_query}")
         print(f"With parameters: {params}")
         self.con.execute(update_query, params)
+        self.reset_highs_and_lows([action['symbol']])
  
 
+    def combine_factors(self, action: dict):
+        """
+        Set the combined adjustment_factor, action_type and action_details of a parsed action.
+        Returns False if nothing was parsed or the factor is 1.
+        """
+        base_factor = 1.0
+        action_types = []
+        action_details = []
+
+        if 'split_factor' in action:
+            base_factor *= action['split_factor']
+            action_types.append('Face Split')
+            action_details.append(f"Face Split: {action['face_split']}")
+        if 'bonus_factor' in action:
+            base_factor *= action['bonus_factor']
+            action_types.append('Bonus')
+            action_details.append(f"Bonus: {action['bonus']}")
+        if 'rights_factor' in action:
+            base_factor *= action['rights_factor']
+            action_types.append('Rights')
+            action_details.append(f"Rights: {action['rights']} (based on close price {action.get('last_day_stock_price_from_exec_date', 'N/A')})")
+        if 'blended_rights_factor' in action:
+            base_factor *= action['blended_rights_factor']
+            action_types.append('Blended Rights')
+            action_details.append(f"Blended Rights: {action['blended_rights']} (based on close price {action.get('last_day_stock_price_from_exec_date', 'N/A')})")
+        # Skip if no action was parsed or factor is 1
+        if not action_types or abs(base_factor - 1.0) < 1e-9:
+            return False
+
+        action['adjustment_factor'] = base_factor
+        action['action_types'] = action_types
+        action['action_type'] = " & ".join(action_types)
+        action['action_details'] = ", ".join(action_details)
+        return True
+
     def process_and_confirm_actions(self, actions_data):
         sorted_actions = sorted(actions_data, key=lambda x: x.get('exec_date', ''))
 
         for action in sorted_actions:
-            # Combine factors
-            base_factor = 1.0
-            action_types = []
-            action_details = []
-
-            if 'split_factor' in action:
-                base_factor *= action['split_factor']
-                action_types.append('Face Split')
-                action_details.append(f"Face Split: {action['face_split']}")
-            if 'bonus_factor' in action:
-                base_factor *= action['bonus_factor']
-                action_types.append('Bonus')
-                action_details.append(f"Bonus: {action['bonus']}")
-            if 'rights_factor' in action:
-                base_factor *= action['rights_factor']
-                action_types.append('Rights')
-                action_details.append(f"Rights: {action['rights']} (based on close price {action.get('last_day_stock_price_from_exec_date', 'N/A')})")
-            if 'blended_rights_factor' in action:
-                base_factor *= action['blended_rights_factor']
-                action_types.append('Blended Rights')
-                action_details.append(f"Blended Rights: {action['blended_rights']} (based on close price {action.get('last_day_stock_price_from_exec_date', 'N/A')})")
-            # Skip if no action was parsed or factor is 1
-            if not action_types or abs(base_factor - 1.0) < 1e-9:
+            if not self.combine_factors(action):
                 continue
 
-            action['adjustment_factor'] = base_factor
-            action['action_type'] = " & ".join(action_types)
-            action['action_details'] = ", ".join(action_details)
-
             if self.check_if_adjustment_already_done(action):
                 continue
             
@@ -311,9 +476,110 @@ class GeneralMeeting():
                 self.update_table(action)
                 self._log_action(action)
 
+    def apply_actions(self, actions_data, approve_types=AUTO_APPROVE_ACTION_TYPES,
+                      approve_factor_range=AUTO_APPROVE_FACTOR_RANGE, dry_run=False):
+        """
+        Batch version of process_and_confirm_actions: every action is checked and applied
+        with a handful of set-based statements instead of several queries and a prompt each.
+
+        An action is approved when all its types are in approve_types (e.g. splits and bonuses)
+        or its factor is within approve_factor_range; the others are left for review
+        (process_and_confirm_actions). Approved actions not in applied_actions_log and with
+        prices before their exec_date get one combined factor per (symbol, exec_date) and
+        are logged, all in one transaction. dry_run=True only reports what would happen.
 
-    def adjust_price(self, file_path):
+        Returns the report: one row per action with its status
+        (applied / would_apply / already_applied / no_data / needs_review).
+        """
+        rows = []
+        for action in actions_data:
+            if self.combine_factors(action):
+                rows.append({key: action[key] for key in
+                             ['symbol', 'exec_date', 'action_type', 'action_types', 'action_details', 'adjustment_factor']})
+        if not rows:
+            print("No corporate actions to apply.")
+            return pd.DataFrame(columns=['symbol', 'exec_date', 'action_type', 'action_details',
+                                         'adjustment_factor', 'status'])
+
+        pending = pd.DataFrame(rows)
+        min_factor, max_factor = approve_factor_range
+        self.con.register("parsed_actions", pending)
+
+        def apply():
+            self.con.execute(f"""
+                CREATE OR REPLACE TEMP TABLE pending_actions AS
+                WITH actions AS (
+                    SELECT DISTINCT ON (symbol, exec_date, action_type)
+                        symbol, exec_date::DATE AS exec_date, action_type, action_types::VARCHAR[] AS action_types,
+                        action_details, adjustment_factor
+                    FROM parsed_actions
+                ),
+                first_dates AS (
+                    SELECT {SYMBOL} AS symbol, MIN({TRADE_DATE}) AS first_date
+                    FROM {self.table}
+                    WHERE {SYMBOL} IN (SELECT symbol FROM actions)
+                    GROUP BY {SYMBOL}
+                )
+                SELECT a.*,
+                    CASE
+                        WHEN l.symbol IS NOT NULL THEN 'already_applied'
+                        WHEN d.first_date IS NULL OR d.first_date >= a.exec_date THEN 'no_data'
+                        WHEN list_has_all(?::VARCHAR[], a.action_types)
+                             OR a.adjustment_factor BETWEEN ? AND ? THEN 'approved'
+                        ELSE 'needs_review'
+                    END AS status
+                FROM actions a
+                LEFT JOIN (SELECT DISTINCT symbol, exec_date, action_type FROM {APPLIED_ACTIONS_LOG}) l
+                    ON a.symbol = l.symbol AND a.exec_date = l.exec_date AND a.action_type = l.action_type
+                LEFT JOIN first_dates d ON a.symbol = d.symbol
+            """, [list(approve_types), min_factor, max_factor])
+
+            if not dry_run:
+                self.con.execute(f"""
+                    INSERT INTO {ADJUSTMENT_FACTORS_TABLE} (symbol, exec_date, factor)
+                    SELECT symbol, exec_date, PRODUCT(adjustment_factor)
+                    FROM pending_actions
+                    WHERE status = 'approved'
+                    GROUP BY symbol, exec_date
+                    ON CONFLICT (symbol, exec_date) DO UPDATE SET
+                        factor = {ADJUSTMENT_FACTORS_TABLE}.factor * excluded.factor
+                """)
+                self.con.execute(f"""
+                    INSERT INTO {APPLIED_ACTIONS_LOG}
+                    SELECT uuid(), symbol, exec_date, action_type, action_details, adjustment_factor, now()
+                    FROM pending_actions
+                    WHERE status = 'approved'
+                """)
+                symbols = self.con.execute(
+                    "SELECT DISTINCT symbol FROM pending_actions WHERE status = 'approved'").fetchall()
+                self.reset_highs_and_lows([symbol for (symbol,) in symbols])
+
+            report = self.con.execute(f"""
+                SELECT symbol, exec_date, action_type, action_details, adjustment_factor,
+                       CASE WHEN status = 'approved' THEN '{'would_apply' if dry_run else 'applied'}'
+                            ELSE status END AS status
+                FROM pending_actions
+                ORDER BY exec_date, symbol
+            """).df()
+            self.con.execute("DROP TABLE pending_actions")
+            return report
+
+        try:
+            report = run_in_transaction(self.con, apply)
+        finally:
+            self.con.unregister("parsed_actions")
+
+        print(f"Corporate actions{' (dry run)' if dry_run else ''}: {report['status'].value_counts().to_dict()}")
+        return report
+
+    def adjust_price(self, file_path, batch=False, dry_run=False):
+        """
+        Apply the actions of a corporate-action file, confirming each one at a prompt,
+        or with batch=True as set by the approval policy of apply_actions.
+        """
         actions_data = self.get_actions_from_csv(file_path)
+        if batch:
+            return self.apply_actions(actions_data, dry_run=dry_run)
         self.process_and_confirm_actions(actions_data)
         
 
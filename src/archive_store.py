@@ -0,0 +1,135 @@
+import hashlib
+import io
+import os
+import re
+import shutil
+import threading
+import zipfile
+from datetime import datetime
+
+import pandas as pd
+
+from constants import ARCHIVE_STORE_DIR, logger
+
+
+class ArchiveStore:
+    """
+    Local store of bhavcopy archives, one ZIP per trade date, kept after extraction
+    so the stocks table can be rebuilt without crawling again.
+    Files are content addressed (<root>/<year>/<YYYYMMDD>_<sha256 prefix>.zip) and never
+    overwritten; index.csv is an append-only log of which file holds each day,
+    the last entry for a day winning.
+    """
+
+    INDEX_COLUMNS = ["trade_date", "content_hash", "path", "size", "last_modified", "stored_at"]
+    MEMBER_DATE = re.compile(r"(\d{8})_")
+
+    def __init__(self, root=ARCHIVE_STORE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, "index.csv")
+        self.index = self._read_index()
+        self._lock = threading.Lock()   # archives can be stored from several threads
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return dict()
+        df = pd.read_csv(self.index_path, dtype=str, keep_default_na=False)
+        df["trade_date"] = pd.to_datetime(df["trade_date"]).dt.date
+        return {row["trade_date"]: row for row in df.to_dict("records")}
+
+    def days(self):
+        """Trade dates the store holds an archive for."""
+        return sorted(self.index)
+
+    def get(self, day):
+        """Path of the archive stored for `day`, or None."""
+        entry = self.index.get(day)
+        if entry is None:
+            return None
+        path = os.path.join(self.root, entry["path"])
+        return path if os.path.exists(path) else None
+
+    def last_modified(self, day):
+        """Last-Modified header the archive for `day` was served with, if known."""
+        entry = self.index.get(day)
+        return entry["last_modified"] or None if entry else None
+
+    def archives(self):
+        """(trade date, path) of every stored archive, oldest first."""
+        return [(day, self.get(day)) for day in self.days() if self.get(day)]
+
+    def put(self, day, data, last_modified=None):
+        """Store the ZIP bytes of one trade date and return its path; identical content is stored once."""
+        content_hash = hashlib.sha256(data).hexdigest()
+        entry = self.index.get(day)
+        if entry and entry["content_hash"] == content_hash and self.get(day):
+            return self.get(day)
+
+        relative_path = os.path.join(f"{day:%Y}", f"{day:%Y%m%d}_{content_hash[:16]}.zip")
+        path = os.path.join(self.root, relative_path)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            part_path = path + ".part"
+            with open(part_path, "wb") as f:
+                f.write(data)
+            os.replace(part_path, path)
+
+        entry = {
+            "trade_date": day, "content_hash": content_hash, "path": relative_path, "size": len(data),
+            "last_modified": last_modified or "", "stored_at": datetime.now().isoformat(),
+        }
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            write_header = not os.path.exists(self.index_path)
+            pd.DataFrame([entry], columns=self.INDEX_COLUMNS).to_csv(
+                self.index_path, mode="a", index=False, header=write_header
+            )
+            self.index[day] = entry
+        return path
+
+    def put_archive(self, zip_path):
+        """
+        Split a multi-day archive (e.g. a browser download for a date range) into one stored
+        ZIP per trade date, taken from the '<YYYYMMDD>_' prefix of each CSV member.
+        Returns True if every CSV member was stored, False also for an archive without any.
+        """
+        by_day = dict()
+        stored_all = True
+        with zipfile.ZipFile(zip_path) as zf:
+            for info in zf.infolist():
+                if not info.filename.lower().endswith(".csv"):
+                    continue
+                match = self.MEMBER_DATE.search(os.path.basename(info.filename))
+                if not match:
+                    logger.warning("No trade date in %s of %s, not stored", info.filename, zip_path)
+                    stored_all = False
+                    continue
+                day = datetime.strptime(match.group(1), "%Y%m%d").date()
+                by_day.setdefault(day, []).append((os.path.basename(info.filename), zf.read(info)))
+
+        for day, members in by_day.items():
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+                for name, data in sorted(members):
+                    # fixed member timestamps keep the bytes, and so the hash, stable across downloads
+                    zf.writestr(zipfile.ZipInfo(name, date_time=(day.year, day.month, day.day, 0, 0, 0)), data,
+                                compress_type=zipfile.ZIP_DEFLATED)
+            self.put(day, buffer.getvalue())
+        logger.info("Stored %d days from %s", len(by_day), zip_path)
+        return stored_all and bool(by_day)
+
+    def extract(self, day, csv_folder):
+        """
+        Unpack the CSVs stored for `day` into csv_folder, prefixed with the trade date
+        (e.g. 20240102_cm02JAN2024bhav.csv) unless they already are, so Cleaner can fall back to it.
+        """
+        os.makedirs(csv_folder, exist_ok=True)
+        with zipfile.ZipFile(self.get(day)) as zf:
+            for info in zf.infolist():
+                if not info.filename.lower().endswith(".csv"):
+                    continue
+                name = os.path.basename(info.filename)
+                if not name.startswith(f"{day:%Y%m%d}_"):
+                    name = f"{day:%Y%m%d}_{name}"
+                with zf.open(info) as src, open(os.path.join(csv_folder, name), "wb") as dst:
+                    shutil.copyfileobj(src, dst)
@@ -0,0 +1,572 @@
+"""
+Benchmarks for the loading and analytics paths.
+Run from src/ like driver.py, e.g. `python benchmark.py staging`.
+Every benchmark works on a throwaway in-memory DuckDB, never on DUCKDB_PATH.
+"""
+import contextlib
+import io
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from constants import (CSV_FOLDER, NIFTY_FIFTY_TABLE, NIFTY_FIFTY_LIST_TABLE, STOCK_TABLE, SUPPORTED_WEEKS,
+                       ROLLING_WINDOWS, ADJUSTMENT_FACTORS_TABLE, ADJUSTED_VIEW_SUFFIX, logger)
+from adjust_price import GeneralMeeting
+from archive_store import ArchiveStore
+from downloader import BhavcopyDownloader
+from fixture_server import BhavcopyFixtureServer
+from nifty_fifty_stocks import NiftyFiftyStocks
+from rolling_extremes import RollingExtremes
+from stocks_pipeline import StocksPipeline
+
+
+def measure(func, *args):
+    """
+    Run func(*args) and return (result, seconds, peak RSS MB).
+    The peak is the process's resident-set high-water mark (ru_maxrss), which covers native
+    allocations (Arrow buffers, DuckDB) as well as Python ones. It never goes down, so it is
+    only the peak of this call when func runs first in a fresh process, see benchmark_staging.
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    return result, seconds, peak_rss_mb()
+
+
+def peak_rss_mb():
+    """Resident-set high-water mark of this process in MB (ru_maxrss is in KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+
+def staging_run(arrow_staging, filenames):
+    """
+    Worker of benchmark_staging, run in a fresh process per path: load `filenames` into
+    a new in-memory database and return the seconds per file with the memory peaks of the
+    process, measured from after the imports and connection setup.
+    """
+    con = duckdb.connect()
+    stocks_pipeline = StocksPipeline(con, arrow_staging=arrow_staging)
+    baseline_mb = peak_rss_mb()
+    seconds = [measure(stocks_pipeline.insert_into_stocks_db, f)[1] for f in filenames]
+    memory = {
+        "baseline_rss_mb": baseline_mb,
+        "peak_rss_mb": peak_rss_mb(),
+        "arrow_peak_mb": pa.default_memory_pool().max_memory() / 2**20,
+    }
+    con.close()
+    return seconds, memory
+
+
+def benchmark_staging(filenames=None):
+    """
+    Time per file and peak memory of insert_into_stocks_db with DataFrame staging versus
+    Arrow staging. Each path runs in its own fresh process, so its RSS high-water mark
+    (DuckDB and Arrow allocations included) and Arrow memory-pool peak are its own.
+    Returns a DataFrame with one row per (path, file); the memory columns are per path.
+    """
+    filenames = filenames or sorted(f for f in os.listdir(CSV_FOLDER) if f.lower().endswith(".csv"))
+    results = []
+    for arrow_staging in [False, True]:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            seconds, memory = pool.submit(staging_run, arrow_staging, filenames).result()
+        for filename, file_seconds in zip(filenames, seconds):
+            results.append({
+                "path": "arrow" if arrow_staging else "pandas",
+                "file": filename,
+                "seconds": file_seconds,
+                **memory,
+                "rss_growth_mb": memory["peak_rss_mb"] - memory["baseline_rss_mb"],
+            })
+
+    report = pd.DataFrame(results)
+    logger.info("Staging benchmark:\n%s", report.groupby("path").agg(
+        files=("file", "count"), seconds=("seconds", "sum"), rss_growth_mb=("rss_growth_mb", "first"),
+        peak_rss_mb=("peak_rss_mb", "first"), arrow_peak_mb=("arrow_peak_mb", "first"),
+    ))
+    return report
+
+
+def benchmark_download(from_date="2023-01-01", to_date="2023-12-31", concurrencies=(1, 4, 16),
+                       latency=0.05, fail_first=1):
+    """
+    Days per second of BhavcopyDownloader against the local fixture server, which adds
+    `latency` seconds per request and fails the first `fail_first` requests of every day.
+    Two more passes per concurrency measure a rerun served from the archive store
+    and a refresh that asks the server conditionally (304s).
+    """
+    results = []
+    for concurrency in concurrencies:
+        with BhavcopyFixtureServer(latency=latency, fail_first=fail_first) as server, \
+                tempfile.TemporaryDirectory() as archive_dir:
+            store = ArchiveStore(archive_dir)
+            for run in ["cold", "cached", "refresh"]:
+                downloader = BhavcopyDownloader(extract=False, url=server.url, concurrency=concurrency,
+                                                backoff=0.01, store=store, refresh=run == "refresh")
+                requests_before = server.requests
+                statuses, seconds, _ = measure(downloader.crawl, from_date, to_date)
+                results.append({
+                    "concurrency": concurrency,
+                    "run": run,
+                    "days": len(statuses),
+                    "failed": sum(s == BhavcopyDownloader.FAILED for s in statuses.values()),
+                    "requests": server.requests - requests_before,
+                    "seconds": seconds,
+                    "days_per_second": len(statuses) / seconds,
+                })
+
+    report = pd.DataFrame(results)
+    logger.info("Download benchmark:\n%s", report)
+    return report
+
+
+def synthetic_nifty_fifty(con, symbols=50, years=10):
+    """Fill nifty_fifty on `con` with a random walk per symbol over `years` years of weekdays."""
+    nifty_fifty_stocks = NiftyFiftyStocks(con)
+    con.execute(f"""
+        INSERT INTO {NIFTY_FIFTY_TABLE} (symbol, trade_date, open, high, low, close)
+        SELECT symbol, trade_date, close, close * (1 + random() / 50), close * (1 - random() / 50), close
+        FROM (
+            SELECT 'SYM' || s.range AS symbol, d.range::DATE AS trade_date,
+                   100 * exp(SUM(random() / 25 - 0.02) OVER (PARTITION BY s.range ORDER BY d.range)) AS close
+            FROM range({symbols}) s,
+                 range(DATE '2000-01-03', DATE '2000-01-03' + INTERVAL {years} YEAR, INTERVAL 1 DAY) d
+            WHERE dayofweek(d.range) BETWEEN 1 AND 5
+        )
+    """)
+    return nifty_fifty_stocks
+
+
+def benchmark_highs_lows(symbols=50, years=10):
+    """
+    Seconds to fill every SUPPORTED_WEEKS high/low column with one self-join UPDATE
+    per window versus the single window-function pass, and the number of rows on
+    which the two disagree (should be 0). Then one trading day is appended and
+    refreshed incrementally from the watermark, compared with a full pass.
+    """
+    con = duckdb.connect()
+    nifty_fifty_stocks = synthetic_nifty_fifty(con, symbols, years)
+    rows = con.execute(f"SELECT COUNT(*) FROM {NIFTY_FIFTY_TABLE}").fetchone()[0]
+    columns = [col for w in SUPPORTED_WEEKS for col in NiftyFiftyStocks.high_low_columns(w)]
+
+    def self_join():
+        for weeks in SUPPORTED_WEEKS:
+            nifty_fifty_stocks.update_high_and_low(weeks, overwrite=True)
+
+    _, self_join_seconds, _ = measure(self_join)
+    con.execute(f"CREATE TEMP TABLE self_join_result AS SELECT symbol, trade_date, {', '.join(columns)} FROM {NIFTY_FIFTY_TABLE}")
+    _, window_seconds, _ = measure(nifty_fifty_stocks.update_highs_and_lows, SUPPORTED_WEEKS, True)
+    mismatch_query = f"""
+        SELECT COUNT(*) FROM {NIFTY_FIFTY_TABLE} n JOIN {{table}} r USING (symbol, trade_date)
+        WHERE {" OR ".join([f"n.{col} IS DISTINCT FROM r.{col}" for col in columns])}
+    """
+    mismatches = con.execute(mismatch_query.format(table="self_join_result")).fetchone()[0]
+
+    # append one more trading day and refresh it incrementally, then check against a full pass
+    con.execute(f"""
+        INSERT INTO {NIFTY_FIFTY_TABLE} (symbol, trade_date, open, high, low, close)
+        SELECT symbol, trade_date + INTERVAL 1 DAY, close, close * 1.01, close * 0.99, close
+        FROM {NIFTY_FIFTY_TABLE}
+        WHERE trade_date = (SELECT MAX(trade_date) FROM {NIFTY_FIFTY_TABLE})
+    """)
+    _, incremental_seconds, _ = measure(nifty_fifty_stocks.update_highs_and_lows_incremental)
+    con.execute(f"CREATE TEMP TABLE incremental_result AS SELECT symbol, trade_date, {', '.join(columns)} FROM {NIFTY_FIFTY_TABLE}")
+    _, full_seconds, _ = measure(nifty_fifty_stocks.update_highs_and_lows, SUPPORTED_WEEKS, True)
+    incremental_mismatches = con.execute(mismatch_query.format(table="incremental_result")).fetchone()[0]
+    con.close()
+
+    report = pd.DataFrame([
+        {"path": "self_join", "rows": rows, "seconds": self_join_seconds, "mismatches": mismatches},
+        {"path": "window", "rows": rows, "seconds": window_seconds, "mismatches": mismatches},
+        {"path": "window_after_append", "rows": rows + symbols, "seconds": full_seconds, "mismatches": 0},
+        {"path": "incremental_append", "rows": symbols, "seconds": incremental_seconds,
+         "mismatches": incremental_mismatches},
+    ])
+    logger.info("Highs/lows benchmark:\n%s", report)
+    return report
+
+
+def synthetic_stocks(con, symbols=2000, years=10):
+    """Fill stocks on `con` with a random walk per symbol over `years` years of weekdays."""
+    StocksPipeline(con)
+    con.execute(f"""
+        INSERT INTO {STOCK_TABLE} (symbol, series, trade_date, open, high, low, close)
+        SELECT symbol, 'EQ', trade_date, close, close * (1 + random() / 50), close * (1 - random() / 50), close
+        FROM (
+            SELECT 'SYM' || s.range AS symbol, d.range::DATE AS trade_date,
+                   100 * exp(SUM(random() / 25 - 0.02) OVER (PARTITION BY s.range ORDER BY d.range)) AS close
+            FROM range({symbols}) s,
+                 range(DATE '2000-01-03', DATE '2000-01-03' + INTERVAL {years} YEAR, INTERVAL 1 DAY) d
+            WHERE dayofweek(d.range) BETWEEN 1 AND 5
+        )
+    """)
+
+
+def benchmark_rolling_extremes(symbols=2000, years=10, windows=ROLLING_WINDOWS):
+    """
+    Seconds to fill the rolling extremes of `windows` over a synthetic stocks universe
+    with DuckDB window functions versus the NumPy engine, and the number of rows on
+    which the two disagree (should be 0).
+    """
+    con = duckdb.connect()
+    synthetic_stocks(con, symbols, years)
+    rows = con.execute(f"SELECT COUNT(*) FROM {STOCK_TABLE}").fetchone()[0]
+    rolling_extremes = RollingExtremes(con)
+
+    _, sql_seconds, _ = measure(rolling_extremes.update_sql, STOCK_TABLE, windows)
+    con.execute(f"CREATE TEMP TABLE sql_result AS SELECT * FROM {rolling_extremes.table}")
+    _, numpy_seconds, _ = measure(rolling_extremes.update, STOCK_TABLE, windows)
+    mismatches = con.execute(f"""
+        SELECT COUNT(*) FROM {rolling_extremes.table} n
+        FULL JOIN sql_result r USING (symbol, trade_date, lookback)
+        WHERE (n.high, n.high_date, n.low, n.low_date) IS DISTINCT FROM (r.high, r.high_date, r.low, r.low_date)
+    """).fetchone()[0]
+    con.close()
+
+    report = pd.DataFrame([
+        {"path": "sql", "rows": rows, "windows": len(windows), "seconds": sql_seconds},
+        {"path": "numpy", "rows": rows, "windows": len(windows), "seconds": numpy_seconds},
+    ])
+    report["mismatches"] = mismatches
+    logger.info("Rolling extremes benchmark:\n%s", report)
+    return report
+
+
+def benchmark_nifty_fifty_sync(symbols=2000, years=10):
+    """
+    Seconds to bring nifty_fifty up to date after one more trading day lands in stocks,
+    with the full join against stocks versus the watermark-driven sync.
+    """
+    con = duckdb.connect()
+    synthetic_stocks(con, symbols, years)
+    nifty_fifty_stocks = NiftyFiftyStocks(con)
+    con.execute(f"INSERT INTO {NIFTY_FIFTY_LIST_TABLE} SELECT 'SYM' || range FROM range(50)")
+    nifty_fifty_stocks.sync_nifty_fifty()
+    con.execute(f"""
+        INSERT INTO {STOCK_TABLE} (symbol, series, trade_date, open, high, low, close)
+        SELECT symbol, series, trade_date + 1, open, high, low, close
+        FROM {STOCK_TABLE} WHERE trade_date = (SELECT MAX(trade_date) FROM {STOCK_TABLE})
+    """)
+    latest_day = f"trade_date = (SELECT MAX(trade_date) FROM {STOCK_TABLE})"
+
+    _, full_seconds, _ = measure(nifty_fifty_stocks.upsert_stocks_to_nifty_fifty_from_all_stocks)
+    full_rows = con.execute(f"SELECT COUNT(*) FROM {NIFTY_FIFTY_TABLE} WHERE {latest_day}").fetchone()[0]
+    con.execute(f"DELETE FROM {NIFTY_FIFTY_TABLE} WHERE {latest_day}")
+    sync_rows, sync_seconds, _ = measure(nifty_fifty_stocks.sync_nifty_fifty)
+    rows = con.execute(f"SELECT COUNT(*) FROM {STOCK_TABLE}").fetchone()[0]
+    con.close()
+
+    report = pd.DataFrame([
+        {"path": "full_join", "stocks_rows": rows, "inserted": full_rows, "seconds": full_seconds},
+        {"path": "watermark_sync", "stocks_rows": rows, "inserted": sync_rows, "seconds": sync_seconds},
+    ])
+    logger.info("NIFTY 50 sync benchmark:\n%s", report)
+    return report
+
+
+def synthetic_action_file(path, lines=200_000, symbols=50, years=10):
+    """
+    Write an NSE-style corporate-action export of `lines` actions over SYM0..SYM<symbols-1>:
+    mostly dividends, with face value splits, bonuses, rights and blended rights mixed in.
+    """
+    rng = np.random.default_rng(0)
+    purposes = np.array([
+        "DIVIDEND - RS {a} PER SHARE", "INTERIM DIVIDEND - RS {a} PER SHARE", "ANNUAL GENERAL MEETING",
+        "FACE VALUE SPLIT (SUB-DIVISION) - FROM RS 10/- PER SHARE TO RS {s}/- PER SHARE", "BONUS {b}:1",
+        "RIGHTS {b}:5 @ PREMIUM RS {a}", "RIGHTS 1:2 @ RS {a} AND 1:3 @ RS 80",
+    ])
+    kinds = rng.choice(len(purposes), lines, p=[0.55, 0.2, 0.1, 0.04, 0.05, 0.04, 0.02])
+    amounts = rng.integers(1, 40, lines)
+    days = pd.Timestamp("2000-03-01") + pd.to_timedelta(rng.integers(0, 365 * (years - 1), lines), unit="D")
+    frame = pd.DataFrame({
+        "SYMBOL": [f"SYM{i}" for i in rng.integers(0, symbols, lines)],
+        "COMPANY": "SYNTHETIC, LTD",
+        "SERIES": "EQ",
+        "PURPOSE": [purposes[k].format(a=a, s=[1, 2, 5][a % 3], b=a % 3 + 1) for k, a in zip(kinds, amounts)],
+        "FACE VALUE": "10",
+        "EX-DATE": days.strftime("%d-%b-%Y"),
+        "RECORD DATE": days.strftime("%d-%b-%Y"),
+    })
+    frame.to_csv(path, index=False, quoting=1)
+
+
+class LineActionParser(GeneralMeeting):
+    """
+    The line-by-line corporate-action parser GeneralMeeting used before read_actions, kept
+    here only as the baseline of benchmark_action_parser. It splits lines on every comma, so
+    it misreads quoted fields that contain one.
+    """
+
+    def get_ratio_and_exec_date(self, symbol: str, exec_date: str, purpose: str, previous_closes):
+        """
+        Parse the split, bonus and rights details of a purpose. Rights need the close before
+        exec_date, taken from previous_closes (see GeneralMeeting.previous_closes).
+        """
+        final_resp = dict()
+        purpose = purpose.strip().upper()
+
+        if "FACE VALUE SPLIT" in purpose:
+            from_match = re.search(
+            r"(?:FROM\s+)?R(?:S|E)\.?\s*(\d+(?:\.\d+)?)", purpose, flags=re.IGNORECASE
+            )
+            to_match = re.search(
+                r"TO\s+R(?:S|E)\.?\s*(\d+(?:\.\d+)?)", purpose, flags=re.IGNORECASE
+            )
+            if from_match and to_match:
+                from_price = float(from_match.group(1))
+                to_price = float(to_match.group(1))
+                final_resp['face_split'] = f"{from_price}:{to_price}"
+                final_resp['split_factor'] = to_price / from_price
+            
+            else:
+                print(f"Unable to find the split values -> {purpose}")
+        
+        if "BONUS" in purpose:
+            bonus_match = re.search(r"BONUS(?:\s+DEBENTURES)?\s+(\d+)\s*:\s*(\d+)", purpose)
+            if bonus_match:
+                new_shares = int(bonus_match.group(1))
+                old_shares = int(bonus_match.group(2))
+                bonus_ratio = f"{new_shares}:{old_shares}"
+                final_resp['bonus'] = bonus_ratio
+                final_resp['bonus_factor'] = old_shares / (old_shares + new_shares)
+            else:
+                print(f"Unable to find the bonus ratio -> {purpose}")
+
+        if "RIGHTS" in purpose:
+            close = previous_closes.get((symbol, exec_date))
+            result = (close,) if close is not None else None
+            if not result:
+                print(f"Unable to fetch price previous to {exec_date} for {symbol} -> {purpose}")
+                return None
+
+            right_match = re.search(r"RIGHTS(?:-EQ)?\s*(\d+)\s*:\s*(\d+)", purpose)
+            price_match = re.search(r"(?:@PREM|@PREMIUM|@ PREMIUM)?\s*R(?:S|E)\.?\s*(\d+(?:\.\d+)?)", purpose, flags=re.IGNORECASE)
+            
+            if right_match and price_match:
+                right_ratio = f"{right_match.group(1)}:{right_match.group(2)}"
+                final_resp['rights'] = right_ratio
+                rights_price = float(price_match.group(1))
+                final_resp["rights_price"] = rights_price
+
+                if not rights_price or not right_ratio:
+                    print(f"Unable to fetch price previous to {exec_date} for {symbol} -> {purpose}")
+                    return None
+
+                cum_rights_price = result[0]
+
+                if cum_rights_price == 0:
+                    print(f"Warning: Prior closing price for {symbol} is zero. Skipping rights adjustment.")
+                    return None
+
+                final_resp['last_day_stock_price_from_exec_date'] = cum_rights_price
+                new_shares, old_shares = map(int, right_ratio.split(':'))
+                ex_rights_price = ((cum_rights_price * old_shares) + (rights_price * new_shares)) / (old_shares + new_shares)
+                final_resp['rights_factor'] = ex_rights_price / cum_rights_price
+            else:
+                self.get_blended_rights(purpose, final_resp, result)
+        
+        final_resp['exec_date'] = exec_date
+        final_resp['symbol'] = symbol
+        return final_resp
+    
+    def get_blended_rights(self, purpose, final_resp, result):
+        pattern = r"(\d+):(\d+).*?@.*?RS\s*(\d+(?:\.\d+)?)"
+        matches = re.findall(pattern, purpose)
+        if not matches:
+            print(f"Could not parse the complex rights issue -> {purpose}")
+            return None
+        else:
+            rights_issues = []
+            blended_rights = []
+            for match in matches:
+                rights_issues.append({
+                    'new_shares': int(match[0]),
+                    'old_shares_basis': int(match[1]), # The 'B' in A:B
+                    'price': float(match[2])
+                })
+            for rights_issue in rights_issues:
+                blended_rights.append(f"{rights_issue['new_shares']}:{rights_issue['old_shares_basis']} at {rights_issue['price']}")
+
+            cum_rights_price = result[0]
+            final_resp['blended_rights'] = ", ".join(blended_rights)
+            final_resp['blended_rights_factor'] = self.calculate_blended_rights_factor(rights_issues, cum_rights_price)
+            final_resp['last_day_stock_price_from_exec_date'] = cum_rights_price
+
+    def get_exec_date(self, ex_date: str):
+        try:
+            ex_date = ex_date.strip().replace('"', '')
+            date_obj = datetime.strptime(ex_date, "%d-%b-%Y")
+            return date_obj.strftime("%Y-%m-%d")
+        except Exception as e:
+            logger.info(f"Unable to parse date {ex_date}")
+        
+
+    def split_csv_line(self, csv_line: str):
+        """(symbol, purpose, exec date) of a corporate-action CSV line."""
+        splitted_lines = csv_line.split(",")
+        
+        symbol = splitted_lines[0].replace('"', '')
+        purpose = splitted_lines[3]
+        ex_date = self.get_exec_date(splitted_lines[5])
+        return symbol, purpose, ex_date
+
+    def get_split_or_bonus_details(self, csv_line: str, previous_closes):
+        symbol, purpose, ex_date = self.split_csv_line(csv_line)
+        split_details = self.get_ratio_and_exec_date(symbol, ex_date, purpose, previous_closes)
+        if not split_details or not ex_date or not symbol:
+            return False
+
+        return split_details
+
+
+    def get_actions_from_csv_lines(self, file_path):
+        """
+        Parses a corporate-action file in two passes: first collect the (symbol, exec date)
+        of every rights issue, and fetch all their previous closes with one query,
+        then parse each line against that lookup.
+        """
+        with open(file_path, 'r') as f:
+            lines = f.readlines()[1:]
+
+        rights_pairs = []
+        for line in lines:
+            symbol, purpose, ex_date = self.split_csv_line(line)
+            if symbol and ex_date and "RIGHTS" in purpose.upper():
+                rights_pairs.append((symbol, ex_date))
+        previous_closes = self.previous_closes(rights_pairs)
+
+        details = []
+        for line in lines:
+            detail = self.get_split_or_bonus_details(line, previous_closes)
+            if detail and ('rights_factor' in detail or 
+                            'bonus_factor' in detail or 
+                            'split_factor' in detail or 
+                            'blended_rights_factor' in detail):
+                details.append(detail)
+        return details
+
+
+def benchmark_action_parser(lines=200_000, symbols=50, years=10):
+    """
+    Lines per second of the line-by-line LineActionParser versus get_actions_from_csv
+    (and read_actions alone, without the conversion to dicts) on a synthetic multi-year
+    export, and the number of parsed actions on which the two parsers disagree.
+    Company names contain a comma, which the line parser cannot split correctly, so it reads
+    a copy of the file without them.
+    """
+    con = duckdb.connect()
+    synthetic_nifty_fifty(con, symbols, years)
+    general_meeting = GeneralMeeting(con)
+    line_parser = LineActionParser(con)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "actions.csv")
+        synthetic_action_file(path, lines, symbols, years)
+        comma_free_path = os.path.join(folder, "actions_comma_free.csv")
+        with open(path) as src, open(comma_free_path, "w") as dst:
+            dst.write(src.read().replace("SYNTHETIC, LTD", "SYNTHETIC LTD"))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            line_actions, line_seconds, _ = measure(line_parser.get_actions_from_csv_lines, comma_free_path)
+            actions, frame_seconds, _ = measure(general_meeting.get_actions_from_csv, path)
+            table, table_seconds, _ = measure(general_meeting.read_actions, path)
+    con.close()
+
+    mismatches = sum(a != b for a, b in zip(line_actions, actions)) + abs(len(line_actions) - len(actions))
+    report = pd.DataFrame([
+        {"path": "lines", "lines": lines, "actions": len(line_actions), "seconds": line_seconds},
+        {"path": "vectorized", "lines": lines, "actions": len(actions), "seconds": frame_seconds},
+        {"path": "typed_table", "lines": lines, "actions": len(table), "seconds": table_seconds},
+    ])
+    report["lines_per_second"] = report["lines"] / report["seconds"]
+    report["mismatches"] = mismatches
+    logger.info("Corporate-action parser benchmark:\n%s", report)
+    return report
+
+
+def benchmark_adjustment(symbols=2000, years=10, actions=5000, legacy_symbols=20):
+    """
+    Seconds to produce split/bonus adjusted prices for a synthetic stocks universe with
+    `actions` corporate actions: the set-based adjusted view (read in full, and materialized)
+    versus one in-place UPDATE per action as in earlier versions of GeneralMeeting.
+    The per-action path runs on a full copy of stocks for the actions of `legacy_symbols` symbols
+    only, and is extrapolated to all actions;
+    mismatches counts the rows of those symbols where both disagree (should be 0).
+    """
+    con = duckdb.connect()
+    synthetic_stocks(con, symbols, years)
+    rows = con.execute(f"SELECT COUNT(*) FROM {STOCK_TABLE}").fetchone()[0]
+    general_meeting = GeneralMeeting(con, STOCK_TABLE)
+    con.execute(f"""
+        INSERT INTO {ADJUSTMENT_FACTORS_TABLE}
+        SELECT DISTINCT ON (symbol, exec_date) symbol, exec_date, factor
+        FROM (
+            SELECT 'SYM' || (random() * {symbols})::INTEGER % {symbols} AS symbol,
+                   (DATE '2000-01-03' + INTERVAL (random() * 365 * {years}) DAY)::DATE AS exec_date,
+                   [0.5, 0.2, 0.1, 0.9][1 + (random() * 4)::INTEGER % 4] AS factor
+            FROM range({actions})
+        )
+    """)
+    actions = con.execute(f"SELECT COUNT(*) FROM {ADJUSTMENT_FACTORS_TABLE}").fetchone()[0]
+
+    general_meeting.create_adjusted_view(STOCK_TABLE)
+    adjusted = f"{STOCK_TABLE}{ADJUSTED_VIEW_SUFFIX}"
+    _, view_seconds, _ = measure(lambda: con.execute(f"SELECT SUM(close), SUM(high) FROM {adjusted}").fetchone())
+    _, materialize_seconds, _ = measure(general_meeting.create_adjusted_view, STOCK_TABLE, True)
+
+    legacy = [f"SYM{i}" for i in range(legacy_symbols)]
+    con.execute(f"CREATE TABLE legacy_stocks AS SELECT * FROM {STOCK_TABLE}")
+    legacy_actions = con.execute(f"""
+        SELECT symbol, exec_date, factor FROM {ADJUSTMENT_FACTORS_TABLE}
+        WHERE symbol IN (SELECT UNNEST(?::VARCHAR[])) ORDER BY exec_date
+    """, [legacy]).fetchall()
+    set_clauses = ", ".join([f"{col.lower()} = {col.lower()} * ?" for col in general_meeting.price_columns])
+
+    def per_action_updates():
+        for symbol, exec_date, factor in legacy_actions:
+            con.execute(f"UPDATE legacy_stocks SET {set_clauses} WHERE symbol = ? AND trade_date < ?",
+                        [factor] * len(general_meeting.price_columns) + [symbol, exec_date])
+
+    _, legacy_seconds, _ = measure(per_action_updates)
+    mismatches = con.execute(f"""
+        SELECT COUNT(*) FROM legacy_stocks l JOIN {adjusted} a USING (symbol, trade_date)
+        WHERE l.symbol IN (SELECT UNNEST(?::VARCHAR[]))
+          AND (abs(l.close - a.close) > 1e-9 * abs(a.close) OR abs(l.low - a.low) > 1e-9 * abs(a.low))
+    """, [legacy]).fetchone()[0]
+    con.close()
+
+    report = pd.DataFrame([
+        {"path": "adjusted_view_read", "rows": rows, "actions": actions, "seconds": view_seconds},
+        {"path": "adjusted_table", "rows": rows, "actions": actions, "seconds": materialize_seconds},
+        {"path": "per_action_update_estimate", "rows": rows, "actions": actions,
+         "seconds": legacy_seconds / max(len(legacy_actions), 1) * actions},
+    ])
+    report["mismatches"] = mismatches
+    logger.info("Corporate-action adjustment benchmark (%d per-action updates timed on %d symbols):\n%s",
+                len(legacy_actions), legacy_symbols, report)
+    return report
+
+
+BENCHMARKS = {
+    "staging": benchmark_staging,
+    "download": benchmark_download,
+    "highs_lows": benchmark_highs_lows,
+    "rolling_extremes": benchmark_rolling_extremes,
+    "nifty_fifty_sync": benchmark_nifty_fifty_sync,
+    "action_parser": benchmark_action_parser,
+    "adjustment": benchmark_adjustment,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(BENCHMARKS[name]())
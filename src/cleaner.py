@@ -1,30 +1,55 @@
-from datetime import datetime
-from fileinput import filename
-import json
 import pandas as pd
+import pyarrow as pa
 import re
-from constants import (ERROR_HEADERS, ERROR_LOG, 
-                       SYMBOL, TIMESTAMP_COLUMN, 
-                       NUMERIC_COLUMNS, TRADE_DATE,
-                       logger)
+from constants import (SYMBOL, TIMESTAMP_COLUMN,
+                       NUMERIC_COLUMNS, INTEGER_COLUMNS, STRING_COLUMNS, TRADE_DATE,
+                       TIMESTAMP_FORMATS, EXCEL_SERIAL_FORMAT, logger)
 
 
 class Cleaner:
-    def __init__(self):
-        pass
+    def __init__(self, rejected_rows=None):
+        """
+        Rejected rows go to `rejected_rows` (a RejectedRows) when given,
+        otherwise they are kept in self.rejected as (filename, reason, frame)
+        for the caller to store, e.g. when cleaning in a worker process.
+        """
+        self.rejected_rows = rejected_rows
+        self.rejected = []
 
-    def clean(self, df, filename):
+    def clean(self, df, filename, as_arrow=False):
+        """
+        Clean a raw bhavcopy frame. as_arrow=True returns a pyarrow.Table,
+        which DuckDB scans without converting the pandas object columns.
+        """
         df = self.clean_string_columns(df)
         df = self.convert_numeric_columns(df)
         df = self.drop_missing_pks(df, filename)
-        df[TRADE_DATE] = df[TIMESTAMP_COLUMN].apply(Cleaner.parse_date_string)
-        df = df.drop_duplicates(subset=[SYMBOL, TRADE_DATE]).copy()
+        df[TRADE_DATE] = Cleaner.parse_dates(df[TIMESTAMP_COLUMN])
+        invalid_date_mask = df[TRADE_DATE].isna()
+        if invalid_date_mask.any():
+            self.reject(df[invalid_date_mask].drop(columns=[TRADE_DATE]), "INVALID_DATE", filename)
+            df = df[~invalid_date_mask]
+        df = df.drop_duplicates(subset=[SYMBOL, TRADE_DATE])
+        if as_arrow:
+            return pa.Table.from_pandas(df, preserve_index=False)
         return df
     
+    def reject(self, df, reason, filename):
+        """Quarantine the rows of df with a reason code."""
+        if self.rejected_rows:
+            self.rejected_rows.insert_frame(df, reason, filename)
+        else:
+            self.rejected.append((filename, reason, df))
+            logger.info("Rejected %d records from %s (%s)", len(df), filename, reason)
+
+    def insert_error(self, filename, reason):
+        """Quarantine a whole file that could not be read, kept with frame None when collecting."""
+        if self.rejected_rows:
+            self.rejected_rows.insert_error(filename, reason)
+        else:
+            self.rejected.append((filename, reason, None))
+
     def drop_missing_pks(self, df, filename):
-        
-        execution_timestamp = datetime.now().isoformat()
-        error_file = ERROR_LOG[:-4] + f"_{execution_timestamp}.csv"
         missing_timestamp_mask = (
             df[TIMESTAMP_COLUMN].isna() | (df[TIMESTAMP_COLUMN].str.strip().str.lower().isin(['', 'nan']))
         )
@@ -48,49 +73,83 @@ class Cleaner:
             | df[TIMESTAMP_COLUMN].isna() | (df[TIMESTAMP_COLUMN].str.strip().str.lower().isin(['', 'nan']))
         )
         if missing_mask.any():
-            dropped = df[missing_mask].copy()
-            dropped_rows = []
-            for idx, row in dropped.iterrows():
-                dropped_rows.append({
-                    "source_file": filename,
-                    "row_index": idx,
-                    "error_reason": "MISSING_PK",
-                    "raw_timestamp": row.get(TIMESTAMP_COLUMN, ""),
-                    "raw_row_json": json.dumps(row.to_dict(), default=str),
-                    "execution_timestamp": datetime.now().isoformat()
-                })
-            pd.DataFrame(dropped_rows, columns=ERROR_HEADERS).to_csv(
-                error_file, mode="a", index=False, header=False
-            )
-            logger.info("Logged %d dropped records from %s", len(dropped_rows), filename)
+            self.reject(df[missing_mask], "MISSING_PK", filename)
             df = df[~missing_mask].copy()
         return df
 
     def clean_string_columns(self, df):
         """
-        Trim and uppercase all string columns (object dtype).
-        We purposely convert all columns to str first because read_csv used dtype=str.
+        Trim and uppercase SYMBOL, SERIES and ISIN, and trim TIMESTAMP.
+        Numeric columns are left alone, they are read typed (see CSV_READ_DTYPES)
+        or converted by convert_numeric_columns.
         """
-        for col in df.columns:
-            # keep TIMESTAMP as-is
-            if col == TIMESTAMP_COLUMN:
-                df[col] = df[col].astype(str).str.strip()
-                continue
-            # ISIN, SYMBOL, SERIES should be uppercased
-            df[col] = df[col].astype(str).str.strip().str.upper()
+        for col in STRING_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype("string[pyarrow]").str.strip().str.upper()
+        if TIMESTAMP_COLUMN in df.columns:
+            df[TIMESTAMP_COLUMN] = df[TIMESTAMP_COLUMN].astype("string[pyarrow]").str.strip()
         return df
-    
-    def convert_numeric_columns(self, df):
-        # Remove commas and convert numeric fields; allow NaNs for bad values
 
+    def convert_numeric_columns(self, df):
+        # Columns read as text (untyped fallback): remove commas and convert; allow NaNs for bad values
         for col in NUMERIC_COLUMNS:
-            if col in df.columns:
+            if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
                 # remove commas, and possible currency characters
                 df[col] = df[col].astype(str).str.replace(",", "", regex=False).str.replace(" ", "")
                 # allow empty strings -> NaN
                 df[col] = pd.to_numeric(df[col].replace('', pd.NA), errors='coerce')
+
+        for col in INTEGER_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].round().astype("Int64")
         return df
-    
+
+    @staticmethod
+    def detect_date_format(series):
+        """
+        Detect the TIMESTAMP format of a column from its first usable value.
+        Returns one of TIMESTAMP_FORMATS, EXCEL_SERIAL_FORMAT or None.
+        """
+        sample = series.dropna()
+        sample = sample[~sample.str.lower().isin(['', 'nan'])]
+        if sample.empty:
+            return None
+        value = sample.iloc[0]
+
+        if re.fullmatch(r'\d+(\.0+)?', value):
+            return EXCEL_SERIAL_FORMAT
+
+        for fmt in TIMESTAMP_FORMATS:
+            if pd.notna(pd.to_datetime(value, format=fmt, errors='coerce')):
+                return fmt
+        return None
+
+    @staticmethod
+    def parse_dates(series):
+        """Vectorized version of parse_date_string for a whole TIMESTAMP column.
+        The format is detected once and the column is converted in one call,
+        only the values that do not match it are parsed row by row.
+        """
+        series = series.astype("string").str.strip()
+        fmt = Cleaner.detect_date_format(series)
+
+        if fmt == EXCEL_SERIAL_FORMAT:
+            serials = pd.to_numeric(series, errors='coerce')
+            serials = serials.where((serials > 0) & (serials <= 60000))
+            parsed = pd.Timestamp('1899-12-30') + pd.to_timedelta(serials.floordiv(1), unit='D')
+        elif fmt is not None:
+            parsed = pd.to_datetime(series, format=fmt, errors='coerce')
+        else:
+            parsed = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+
+        leftovers = parsed.isna() & series.notna()
+        if leftovers.any():
+            parsed = parsed.astype("datetime64[ns]")
+            parsed[leftovers] = pd.to_datetime(
+                series[leftovers].map(Cleaner.parse_date_string), errors='coerce'
+            )
+        return parsed
+
     @staticmethod
     def parse_date_string(s):
         """Robust date parser for TIMESTAMP values.
@@ -111,8 +170,7 @@ class Cleaner:
             return Cleaner.excel_serial_to_timestamp(s)
 
         # Try explicit known formats first
-        fmts = ("%d-%b-%Y", "%d-%b-%y", "%d-%b-%Y %H:%M:%S", "%d-%b-%y %H:%M:%S")
-        for fmt in fmts:
+        for fmt in TIMESTAMP_FORMATS:
             try:
                 return pd.to_datetime(s, format=fmt, dayfirst=True)
             except Exception:
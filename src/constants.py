@@ -1,12 +1,12 @@
 import logging
 import os
-import pandas as pd
 
 CSV_FOLDER = "../data/extracted_data"          # relative folder containing CSVs
 DUCKDB_PATH = "../DBs/nse_stocks.duckdb"     # persistent duckdb file in current folder
-ERROR_LOG = "./load_errors.csv"          # file where bad rows are appended
-PARSED_FILES = "../data/parsed_files.txt"  # file where parsed filenames are logged
 COMPRESSED_DATA_DIR = "../data/Compressed_data"  # folder where downloaded ZIPs are stored
+ARCHIVE_STORE_DIR = os.path.join(COMPRESSED_DATA_DIR, "store")  # per-day ZIPs keyed by trade date and content hash
+HOLIDAYS_FILE = "../data/nse_holidays.csv"      # exchange holidays, one date per row in a "date" column
+NIFTY_500_LIST_FILE = "../data/ind_nifty500list.csv"   # NSE NIFTY 500 constituents, symbols in a "Symbol" column
 
 STOCK_TABLE = "stocks"                   # main table name
 STAGING_TABLE = "staging"                # staging table name
@@ -14,6 +14,13 @@ CRAWLED_TILL_DATE_TABLE = "crawled_till"    # table to track last crawled date
 NIFTY_FIFTY_LIST_TABLE = "nifty_fifty_list"        # NIFTY 50 stocks list table name
 NIFTY_FIFTY_TABLE = "nifty_fifty"        # NIFTY 50 stocks table name
 APPLIED_ACTIONS_LOG = "applied_actions_log"        # table to log applied actions
+ADJUSTMENT_FACTORS_TABLE = "adjustment_factors"    # corporate-action price factors per symbol and exec date
+ADJUSTED_VIEW_SUFFIX = "_adjusted"      # <table>_adjusted is the split/bonus/rights adjusted view of a table
+INGEST_MANIFEST_TABLE = "ingest_manifest"  # table of loaded CSVs with their size, mtime and hash
+REJECTED_ROWS_TABLE = "rejected_rows"      # quarantine for rows that could not be loaded
+NIFTY_FIFTY_SYNC_TABLE = "nifty_fifty_sync"  # last stocks trade date copied into nifty_fifty, per symbol
+HIGH_LOW_WATERMARK_TABLE = "high_low_watermarks"  # last trade date with highs/lows computed, per window
+ROLLING_EXTREMES_TABLE = "rolling_extremes"  # rolling highs/lows of all stocks, per lookback window
 
 TIMESTAMP_COLUMN = "TIMESTAMP"           # timestamp column name
 SYMBOL = "SYMBOL"                        # symbol column name
@@ -44,6 +51,16 @@ STOCK_TABLE_COL_TYPES = {
         TRADE_DATE: "DATE"
     }
 
+# pandas dtypes used to read the CSV columns straight to their final types.
+# BIGINT columns are read as float64 because Int64 ignores thousands separators, Cleaner casts them.
+PANDAS_READ_DTYPES = {"VARCHAR": "string[pyarrow]", "DOUBLE": "float64", "BIGINT": "float64"}
+CSV_READ_DTYPES = {
+        col: PANDAS_READ_DTYPES[col_type] for col, col_type in STOCK_TABLE_COL_TYPES.items()
+        if col != TRADE_DATE
+    }
+INTEGER_COLUMNS = [col for col, col_type in STOCK_TABLE_COL_TYPES.items() if col_type == "BIGINT"]
+STRING_COLUMNS = [SYMBOL, "SERIES", "ISIN"]   # columns that get trimmed and upper-cased
+
 NIFTY_FIFTY_COL_TYPES = {
         SYMBOL: "VARCHAR",
         "SERIES": "VARCHAR",
@@ -70,10 +87,44 @@ NIFTY_FIFTY_COL_TYPES = {
         "WEEK_HIGH_12_DATE": "DATE",
         "WEEK_LOW_12": "DOUBLE",
         "WEEK_LOW_12_DATE": "DATE",
+        "WEEK_HIGH_24": "DOUBLE",
+        "WEEK_HIGH_24_DATE": "DATE",
         "WEEK_LOW_24": "DOUBLE",
         "WEEK_LOW_24_DATE": "DATE"
     }
 
+# Supported time periods for highs/lows
+SUPPORTED_WEEKS = [4, 12, 24, 52]
+ROLLING_WINDOWS = ["20d", "52w", "3y"]     # default lookbacks of RollingExtremes: <n>d trading days, <n>w/m/y calendar
+ROLLING_CHUNK_ROWS = 1_000_000          # rows per chunk of symbols processed at once by RollingExtremes
+
+# batch corporate actions: approved when all their types are listed, or when their factor is in the range
+AUTO_APPROVE_ACTION_TYPES = ["Face Split", "Bonus"]
+AUTO_APPROVE_FACTOR_RANGE = (0.8, 1.0)
+
+# known TIMESTAMP formats, tried in this order when detecting a file's format
+TIMESTAMP_FORMATS = ("%d-%b-%Y", "%d-%b-%y", "%d-%b-%Y %H:%M:%S", "%d-%b-%y %H:%M:%S")
+EXCEL_SERIAL_FORMAT = "EXCEL_SERIAL"
+
+LOAD_ENGINES = ["pandas", "duckdb", "parallel", "batched", "chunked"]     # engines supported by load_stocks_history_data
+LOAD_WORKERS = os.cpu_count() or 1      # worker processes used by the parallel engine
+LOAD_BATCH_SIZE = 50                    # files upserted per transaction by the parallel and batched engines
+LOAD_BATCH_ROWS = 500_000               # row budget per transaction for the batched engine
+ARROW_STAGING = True                    # hand cleaned data to DuckDB as Arrow tables rather than DataFrames
+CSV_CHUNK_SIZE = 100_000                # rows per chunk for the chunked engine, caps memory per file
+
+CRAWL_MODES = ["http", "browser", "windows"]       # modes supported by crawl_data
+CRAWL_WINDOW_DAYS = 7                   # days per window in the windows crawl mode
+CRAWL_BROWSER_CONTEXTS = 4              # browser contexts crawling windows at the same time
+PIPELINE_QUEUE_SIZE = 2                 # windows buffered between two stages of run_pipeline
+# per-day NSE equity bhavcopy archive, filled in with the trade date
+BHAVCOPY_URL = "https://nsearchives.nseindia.com/content/historical/EQUITIES/{year}/{month}/cm{day}{month}{year}bhav.csv.zip"
+HTTP_HEADERS = {"User-Agent": "Mozilla/5.0", "Accept": "*/*"}
+DOWNLOAD_CONCURRENCY = 8                # days downloaded at the same time by the http crawl mode
+DOWNLOAD_RETRIES = 3                    # retries per day on timeouts, 429 and 5xx responses
+DOWNLOAD_BACKOFF = 1.0                  # seconds before the first retry, doubled on every retry
+DOWNLOAD_TIMEOUT = 30                   # seconds per request
+
 NUMERIC_COLUMNS = [
     "OPEN","HIGH","LOW","CLOSE","LAST","PREVCLOSE","TOTTRDQTY","TOTTRDVAL","TOTALTRADES"
 ]
@@ -89,13 +140,5 @@ NIFTY_FIFTY = [
 ]
 #INDIA CEMENTS, DEEPAK NITRITE
 
-ERROR_HEADERS = [
-    "source_file", "row_index", "error_reason", "raw_timestamp", "raw_row_json",
-    "execution_timestamp"
-]
-
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
 logger = logging.getLogger("duckdb_loader")
-
-if not os.path.exists(ERROR_LOG):
-    pd.DataFrame(columns=ERROR_HEADERS).to_csv(ERROR_LOG, index=False)
@@ -1,14 +1,24 @@
 import asyncio
 import zipfile
 from playwright.async_api import async_playwright
-from constants import CSV_FOLDER, COMPRESSED_DATA_DIR, logger
+import pandas as pd
+from archive_store import ArchiveStore
+from constants import (CSV_FOLDER, COMPRESSED_DATA_DIR,
+                       CRAWL_WINDOW_DAYS, CRAWL_BROWSER_CONTEXTS, logger)
+from trading_calendar import TradingCalendar
 import os
-import time
 
 
 class Crawler:
-    def __init__(self):
+    def __init__(self, extract=True, store=None):
+        """
+        Every downloaded ZIP is split into per-day archives in `store` (an ArchiveStore,
+        the default one when not given), which StocksPipeline.insert_from_zip can load;
+        extract=True also unpacks it into CSV_FOLDER.
+        """
         self.URL = "https://www.samco.in/bhavcopy-nse-bse-mcx"
+        self.extract = extract
+        self.store = store or ArchiveStore()
 
     async def download_and_extract(self, from_date, to_date):
         # Ensure download directory exists
@@ -17,13 +27,21 @@ class Crawler:
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=False)  # Change to True if you want headless
             context = await browser.new_context(accept_downloads=True)
-            page = await context.new_page()
+            await self.download_window(context, from_date, to_date)
+            await browser.close()
 
+    async def download_window(self, context, from_date, to_date):
+        """
+        Download (and extract) the bhavcopies of one date range in a page of `context`.
+        True only if every CSV of the download was stored in the archive store.
+        """
+        page = await context.new_page()
+        try:
             # Go to website
             await page.goto(self.URL)
             logger.info(f"Navigated to {self.URL}")
             await page.wait_for_selector("#start_date")
-            time.sleep(1)  # Extra wait to ensure page is fully loaded
+            await asyncio.sleep(1)  # Extra wait to ensure page is fully loaded
             # Fill the date fields
             logger.info(f"Setting the start date {from_date}")
             await page.locator("#start_date").fill(from_date)
@@ -31,41 +49,126 @@ class Crawler:
             await page.wait_for_selector("#end_date")
             logger.info(f"Setting the end date {to_date}")
             await page.locator("#end_date").fill(to_date)
-            time.sleep(1)
+            await asyncio.sleep(1)
 
             # Select segments
             await page.locator("label").filter(has_text="NSE F&O").locator("span").click()
-            time.sleep(0.5)
+            await asyncio.sleep(0.5)
             await page.locator("label").filter(has_text="BSE Cash").locator("span").click()
-            time.sleep(0.5)
+            await asyncio.sleep(0.5)
             await page.locator("label").filter(has_text="MCX").locator("span").click()
-            time.sleep(0.5)
+            await asyncio.sleep(0.5)
             logger.info("Unselected all except NSE bhav copy")
             # Click on Download and wait for the file
-            try:
-                async with page.expect_download(timeout=120000) as download_info:  # 2 min timeout
-                    await page.get_by_role("link", name="Download", exact=True).click()
-
-                download = await download_info.value
+            async with page.expect_download(timeout=120000) as download_info:  # 2 min timeout
+                await page.get_by_role("link", name="Download", exact=True).click()
 
-                filename = f"bhavcopy_{from_date}_to_{to_date}.zip"
-                save_path = os.path.join(COMPRESSED_DATA_DIR, filename)
-                zip_path = os.path.join(COMPRESSED_DATA_DIR, filename)
+            download = await download_info.value
 
-                await download.save_as(save_path)
-                print(f"Download successful: {save_path}")
+            filename = f"bhavcopy_{from_date}_to_{to_date}.zip"
+            save_path = os.path.join(COMPRESSED_DATA_DIR, filename)
+            zip_path = os.path.join(COMPRESSED_DATA_DIR, filename)
 
-                with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                    zip_ref.extractall(CSV_FOLDER)
-                print(f"Extracted to: {CSV_FOLDER}")
+            await download.save_as(save_path)
+            print(f"Download successful: {save_path}")
 
+            stored = await asyncio.to_thread(self.store.put_archive, zip_path)
+            if self.extract:
+                await asyncio.to_thread(self._extract, zip_path)
+            elif stored:
                 os.remove(zip_path)
-                print(f"Deleted ZIP file: {zip_path}")
+                print(f"Stored in {self.store.root}, deleted ZIP file: {zip_path}")
+            else:
+                print(f"Kept ZIP file: {zip_path}")
+            if not stored:
+                logger.error("Not every day of %s to %s could be stored from %s", from_date, to_date, filename)
+            return bool(stored)
+
+        except Exception as e:
+            print(f"Download failed: {e}")
+            return False
+        finally:
+            await page.close()
+
+    @staticmethod
+    def _extract(zip_path):
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            zip_ref.extractall(CSV_FOLDER)
+        print(f"Extracted to: {CSV_FOLDER}")
 
-            except Exception as e:
-                print(f"Download failed: {e}")
+        os.remove(zip_path)
+        print(f"Deleted ZIP file: {zip_path}")
 
+    @staticmethod
+    def split_windows(ranges, window_days=CRAWL_WINDOW_DAYS):
+        """Split (from_date, to_date) ranges into windows of at most window_days days, as 'YYYY-MM-DD' pairs."""
+        windows = []
+        for from_date, to_date in ranges:
+            for start in pd.date_range(from_date, to_date, freq=f"{window_days}D"):
+                end = min(start + pd.Timedelta(days=window_days - 1), pd.Timestamp(to_date))
+                windows.append((f"{start:%Y-%m-%d}", f"{end:%Y-%m-%d}"))
+        return windows
+
+    def pending_windows(self, ranges, window_days=CRAWL_WINDOW_DAYS, calendar=None):
+        """
+        The windows of `ranges` that still need crawling, each narrowed to the span of its
+        trading days missing from the archive store. The store is the record of what was
+        crawled, so nothing depends on how the ranges were split on an earlier run.
+        Stored days are extracted to CSV_FOLDER if extract=True, as a crawl would.
+        """
+        calendar = calendar or TradingCalendar()
+        windows = []
+        for window in self.split_windows(ranges, window_days):
+            days = calendar.trading_days(*window)
+            missing = [day for day in days if not self.store.get(day)]
+            if self.extract:
+                for day in days:
+                    if day not in missing:
+                        self.store.extract(day, CSV_FOLDER)
+            if missing:
+                windows.append((f"{missing[0]:%Y-%m-%d}", f"{missing[-1]:%Y-%m-%d}"))
+        return windows
+
+    async def download_windows(self, ranges, window_days=CRAWL_WINDOW_DAYS, contexts=CRAWL_BROWSER_CONTEXTS):
+        """
+        Crawl the ranges as windows of `window_days` days, `contexts` windows at a time,
+        each in a context from a pool shared by one headless browser.
+        Only trading days missing from the archive store are crawled (see pending_windows),
+        so a rerun picks up exactly what an earlier one did not get.
+        Returns the windows that failed.
+        """
+        os.makedirs(COMPRESSED_DATA_DIR, exist_ok=True)
+        windows = self.pending_windows(ranges, window_days)
+        logger.info("Crawling %d windows", len(windows))
+        if not windows:
+            return []
+
+        failed = []
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            pool = asyncio.Queue()
+            for _ in range(min(contexts, len(windows))):
+                pool.put_nowait(await browser.new_context(accept_downloads=True))
+
+            async def crawl_window(window):
+                context = await pool.get()
+                try:
+                    ok = await self.download_window(context, *window)
+                finally:
+                    pool.put_nowait(context)
+                if not ok:
+                    failed.append(window)
+
+            await asyncio.gather(*[crawl_window(window) for window in windows])
+            while not pool.empty():
+                await pool.get_nowait().close()
             await browser.close()
 
+        logger.info("Crawled %d windows, %d failed", len(windows) - len(failed), len(failed))
+        return failed
+
     def crawl(self, from_date, to_date):
         asyncio.run(self.download_and_extract(from_date, to_date))
+
+    def crawl_windows(self, ranges, window_days=CRAWL_WINDOW_DAYS, contexts=CRAWL_BROWSER_CONTEXTS):
+        return asyncio.run(self.download_windows(ranges, window_days, contexts))
@@ -0,0 +1,121 @@
+import asyncio
+import random
+import urllib.error
+import urllib.request
+
+import pandas as pd
+
+from archive_store import ArchiveStore
+from constants import (CSV_FOLDER, BHAVCOPY_URL, HTTP_HEADERS,
+                       DOWNLOAD_CONCURRENCY, DOWNLOAD_RETRIES, DOWNLOAD_BACKOFF, DOWNLOAD_TIMEOUT, logger)
+from trading_calendar import TradingCalendar
+
+
+class BhavcopyDownloader:
+    """
+    Downloads the per-day bhavcopy archives over plain HTTP, without a browser.
+    Days are fetched `concurrency` at a time; timeouts, 429 and 5xx responses are retried
+    with exponential backoff. A day already in the archive store is not requested at all,
+    unless refresh=True, in which case it is fetched again only if the server has a
+    newer copy (If-Modified-Since).
+    """
+
+    DOWNLOADED = "downloaded"
+    CACHED = "cached"
+    NOT_MODIFIED = "not_modified"
+    MISSING = "missing"     # 404: a holiday, or a day not published yet
+    FAILED = "failed"
+
+    def __init__(self, extract=True, url=BHAVCOPY_URL, concurrency=DOWNLOAD_CONCURRENCY,
+                 retries=DOWNLOAD_RETRIES, backoff=DOWNLOAD_BACKOFF, timeout=DOWNLOAD_TIMEOUT,
+                 store=None, csv_folder=CSV_FOLDER, refresh=False):
+        """
+        The ZIPs are kept in `store` (an ArchiveStore, the default one when not given);
+        extract=True also unpacks each day, downloaded or cached, into `csv_folder`.
+        """
+        if concurrency < 1 or retries < 0:
+            raise ValueError("concurrency must be at least 1 and retries at least 0.")
+        self.extract = extract
+        self.url = url
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.store = store or ArchiveStore()
+        self.csv_folder = csv_folder
+        self.refresh = refresh
+
+    def url_for(self, day):
+        return self.url.format(year=f"{day:%Y}", month=f"{day:%b}".upper(), day=f"{day:%d}")
+
+    def _get(self, url, if_modified_since=None):
+        """Blocking GET, returns (status, body, Last-Modified header)."""
+        headers = dict(HTTP_HEADERS)
+        if if_modified_since:
+            headers["If-Modified-Since"] = if_modified_since
+        request = urllib.request.Request(url, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read(), response.headers.get("Last-Modified")
+        except urllib.error.HTTPError as e:
+            return e.code, None, e.headers.get("Retry-After")
+
+    async def fetch(self, day, semaphore):
+        """Download the archive of one trading day, returns one of the status constants."""
+        if self.store.get(day) and not self.refresh:
+            if self.extract:
+                await asyncio.to_thread(self.store.extract, day, self.csv_folder)
+            return self.CACHED
+
+        url = self.url_for(day)
+        if_modified_since = self.store.last_modified(day) if self.store.get(day) else None
+
+        for attempt in range(self.retries + 1):
+            async with semaphore:
+                try:
+                    status, body, header = await asyncio.to_thread(self._get, url, if_modified_since)
+                except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                    status, body, header = None, None, None
+                    logger.warning("Fetching %s failed: %s", url, e)
+
+            if status == 200:
+                # writing and unzipping happen off the event loop, like the GET
+                await asyncio.to_thread(self.store.put, day, body, header)
+                if self.extract:
+                    await asyncio.to_thread(self.store.extract, day, self.csv_folder)
+                return self.DOWNLOADED
+            if status == 304:
+                return self.NOT_MODIFIED
+            if status == 404:
+                logger.info("No bhavcopy published for %s", day)
+                return self.MISSING
+            if status is not None and status != 429 and status < 500:
+                logger.error("Fetching %s returned HTTP %d", url, status)
+                return self.FAILED
+
+            if attempt < self.retries:
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                if status == 429 and header and header.isdigit():
+                    delay = max(delay, int(header))
+                logger.info("Retrying %s in %.1fs (HTTP %s)", url, delay, status)
+                await asyncio.sleep(delay)
+
+        logger.error("Giving up on %s after %d attempts", url, self.retries + 1)
+        return self.FAILED
+
+    async def download_days(self, days):
+        """Download the given trading days, returns {date: status}."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        statuses = await asyncio.gather(*[self.fetch(day, semaphore) for day in days])
+        return dict(zip(days, statuses))
+
+    def crawl_days(self, days):
+        """Synchronous entry point for a list of days, e.g. the gaps found by TradingCalendar."""
+        statuses = asyncio.run(self.download_days(list(days)))
+        summary = pd.Series(statuses, dtype=object).value_counts().to_dict()
+        logger.info("Downloaded %d days: %s", len(statuses), summary)
+        return statuses
+
+    def crawl(self, from_date, to_date):
+        """Download every trading day from from_date to to_date, same signature as Crawler.crawl."""
+        return self.crawl_days(TradingCalendar().trading_days(from_date, to_date))
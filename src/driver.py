@@ -1,7 +1,13 @@
 import os
-from constants import CSV_FOLDER, DUCKDB_PATH, PARSED_FILES, TRADE_DATE, STOCK_TABLE, CRAWLED_TILL_DATE_TABLE, LAST_CRAWLED_DATE
+from constants import (CSV_FOLDER, COMPRESSED_DATA_DIR, DUCKDB_PATH, TRADE_DATE, STOCK_TABLE, CRAWLED_TILL_DATE_TABLE,
+                       LAST_CRAWLED_DATE, LOAD_ENGINES, CRAWL_MODES, LOAD_WORKERS, LOAD_BATCH_SIZE, LOAD_BATCH_ROWS, CSV_CHUNK_SIZE,
+                       CRAWL_WINDOW_DAYS, PIPELINE_QUEUE_SIZE, SUPPORTED_WEEKS, ROLLING_WINDOWS,
+                       NIFTY_FIFTY_TABLE, ADJUSTED_VIEW_SUFFIX, HOLIDAYS_FILE)
 from duckdb_manager import DuckDBManager
 from stocks_pipeline import StocksPipeline
+from ingest_manifest import IngestManifest
+from trading_calendar import TradingCalendar
+from archive_store import ArchiveStore
 from nifty_fifty_stocks import NiftyFiftyStocks
 import pandas as pd
 from adjust_price import GeneralMeeting
@@ -9,24 +15,42 @@ from adjust_price import GeneralMeeting
 duckdb_manager = DuckDBManager(DUCKDB_PATH)
 con = duckdb_manager.get_connection()
 
-def load_stocks_history_data(overwrite=False):
-    with open(PARSED_FILES, "r") as f:
-        parsed_csv_files = [line.strip() for line in f if line.strip()]
-    
-    all_csv_files = os.listdir(CSV_FOLDER)
-    csv_files_to_process = None
-    if overwrite:
-        csv_files_to_process = [f for f in all_csv_files if f.lower().endswith('.csv')]
-    else:
-        csv_files_to_process = [f for f in all_csv_files if f.lower().endswith('.csv') and f not in parsed_csv_files]
+def load_stocks_history_data(overwrite=False, engine="pandas", workers=LOAD_WORKERS,
+                             batch_size=LOAD_BATCH_SIZE, batch_rows=LOAD_BATCH_ROWS, chunk_size=CSV_CHUNK_SIZE):
+    """
+    Load the CSVs in CSV_FOLDER into the stocks table.
+    engine="pandas" loads file by file through Cleaner,
+    engine="duckdb" loads all new files with a single DuckDB read_csv,
+    engine="parallel" cleans files in `workers` processes and writes them `batch_size` at a time,
+    engine="batched" commits once per `batch_size` files or `batch_rows` rows,
+    engine="chunked" streams each file `chunk_size` rows at a time for files too big for memory.
+    """
+    if engine not in LOAD_ENGINES:
+        raise ValueError(f"Invalid engine parameter. Must be one of {LOAD_ENGINES}.")
+
+    all_csv_files = [f for f in os.listdir(CSV_FOLDER) if f.lower().endswith('.csv')]
+    manifest = IngestManifest(con)
+    csv_files_to_process = manifest.files_to_load(CSV_FOLDER, all_csv_files, overwrite)
 
     stocks_pipeline = StocksPipeline(con)
-    mode = "w" if overwrite else "a"
-    with open(PARSED_FILES, mode) as f:
+    if engine == "duckdb":
+        stocks_pipeline.bulk_insert_into_stocks_db(csv_files_to_process, manifest)
+    elif engine == "parallel":
+        from parallel_loader import ParallelLoader
+        ParallelLoader(con, workers, batch_size, manifest, stocks_pipeline.rejected_rows).load(csv_files_to_process)
+    elif engine == "batched":
+        stocks_pipeline.insert_many_into_stocks_db(csv_files_to_process, batch_size, batch_rows, manifest)
+    elif engine == "chunked":
         for filename in csv_files_to_process:
-            stocks_pipeline.insert_into_stocks_db(filename)
-            f.write(f"{filename}\n")
-    
+            stocks_pipeline.insert_into_stocks_db_chunked(filename, chunk_size, manifest)
+    else:
+        for filename in csv_files_to_process:
+            stocks_pipeline.insert_into_stocks_db(filename, manifest)
+
+    rejected = stocks_pipeline.rejected_rows.counts(stocks_pipeline.rejected_rows.run_id)
+    if not rejected.empty:
+        print(f"Rejected rows in this run:\n{rejected}")
+
     result = con.execute(f"SELECT MAX({TRADE_DATE.lower()}) FROM {STOCK_TABLE}").fetchone()
     if result and result[0]:
         latest_date = result[0]
@@ -38,41 +62,172 @@ def load_stocks_history_data(overwrite=False):
         """, (latest_date,))
         print(f"Updated {CRAWLED_TILL_DATE_TABLE} with latest crawled date: {latest_date}")
 
+def load_stocks_from_archives(overwrite=False):
+    """
+    Load the per-day ZIPs of the archive store, oldest first, and any other ZIPs kept in
+    COMPRESSED_DATA_DIR, reading the CSVs straight from the archives.
+    With overwrite=True on an empty database this rebuilds stocks without crawling.
+    """
+    manifest = IngestManifest(con)
+    stocks_pipeline = StocksPipeline(con)
+    for _, zip_path in ArchiveStore().archives():
+        stocks_pipeline.insert_from_zip(zip_path, manifest, overwrite)
+    for archive in sorted(os.listdir(COMPRESSED_DATA_DIR)):
+        if archive.lower().endswith(".zip"):
+            stocks_pipeline.insert_from_zip(os.path.join(COMPRESSED_DATA_DIR, archive), manifest, overwrite)
+    stocks_pipeline.update_the_crawled_till_date()
+
 def load_nifty_fifty_stocks_list_to_db():
     nifty_fifty_stocks = NiftyFiftyStocks(con)
     nifty_fifty_stocks.upsert_stocks_to_nifty_fifty_list()
 
-def load_nifty_fifty_stocks_to_db():
+def load_nifty_fifty_stocks_to_db(full=False, since=None):
+    """
+    Copy the new stocks rows of the NIFTY 50 symbols (see NiftyFiftyStocks.sync_nifty_fifty),
+    including rows loaded before the last sync; full=True joins all of stocks again.
+    """
     nifty_fifty_stocks = NiftyFiftyStocks(con)
-    nifty_fifty_stocks.upsert_stocks_to_nifty_fifty_from_all_stocks()
+    if full:
+        nifty_fifty_stocks.upsert_stocks_to_nifty_fifty_from_all_stocks()
+    else:
+        nifty_fifty_stocks.sync_nifty_fifty(since)
 
-def update_nifty_fifty_highs_lows():
-    weeks = [4, 12, 24, 52]
-    for week in weeks:
-        nifty_fifty_stocks = NiftyFiftyStocks(con)
-        nifty_fifty_stocks.update_high_and_low(week, overwrite=True)
+def update_nifty_fifty_highs_lows(incremental=False):
+    """incremental=True only computes the days added since the last run (see update_highs_and_lows_incremental)."""
+    nifty_fifty_stocks = NiftyFiftyStocks(con)
+    if incremental:
+        nifty_fifty_stocks.update_highs_and_lows_incremental(SUPPORTED_WEEKS)
+    else:
+        nifty_fifty_stocks.update_highs_and_lows(SUPPORTED_WEEKS, overwrite=True)
+
+def update_rolling_extremes(windows=ROLLING_WINDOWS, source=STOCK_TABLE):
+    """Rolling highs and lows of any lookbacks (e.g. "20d", "3y") over every symbol of `source`."""
+    from rolling_extremes import RollingExtremes
+    RollingExtremes(con).update(source, windows)
 
-def adjust_price():
-    gm = GeneralMeeting(con)
+def adjust_price(batch=False, dry_run=False, table=NIFTY_FIFTY_TABLE):
+    """
+    Apply the corporate-action files with one prompt per action, as GeneralMeeting.adjust_price,
+    or approved by the AUTO_APPROVE_* policy with batch=True (dry_run=True only prints the report).
+    Actions are checked against `table`, e.g. STOCK_TABLE for symbols outside the NIFTY 50.
+    """
+    gm = GeneralMeeting(con, table)
     all_csv_files = os.listdir("../data/corporate_action/")
     for file in all_csv_files:
         file_path = f"../data/corporate_action/{file}"
         if file_path.endswith(".csv"):
-            gm.adjust_price(file_path)
-
-def crawl_data():
-    from crawler import Crawler
-    crawler = Crawler()
-    query = "SELECT MAX({}) FROM {}".format(LAST_CRAWLED_DATE, CRAWLED_TILL_DATE_TABLE)
-    result = con.execute(query).fetchone()
-    last_crawled_date = str(result[0]) if result else None
-    to_date = pd.Timestamp.now().strftime("%Y-%m-%d").upper()
-    if last_crawled_date and last_crawled_date <= to_date:
-        print(f"Crawled date is {last_crawled_date}")
-        print(f"Crawling date till {to_date}")
-        crawler.crawl(last_crawled_date, to_date)
+            report = gm.adjust_price(file_path, batch=batch, dry_run=dry_run)
+            if batch:
+                print(report.to_string())
+
+def create_adjusted_prices(table=STOCK_TABLE, materialize=False, symbols_file=None):
+    """
+    Corporate-action adjusted prices of any table as <table>_adjusted (see GeneralMeeting.create_adjusted_view).
+    symbols_file (e.g. NIFTY_500_LIST_FILE) keeps only the symbols in its Symbol column,
+    as <table>_<file name>_adjusted.
+    """
+    gm = GeneralMeeting(con, table)
+    if symbols_file is None:
+        gm.create_adjusted_view(table, materialize)
+        return
+    symbols = pd.read_csv(symbols_file)["Symbol"].str.strip().str.upper().tolist()
+    name = f"{table}_{os.path.splitext(os.path.basename(symbols_file))[0]}{ADJUSTED_VIEW_SUFFIX}"
+    gm.create_adjusted_view(table, materialize, symbols, name)
+
+def holiday_candidates(days, store):
+    """The past days of `days` with no archive in `store`, reported for confirmation as holidays."""
+    today = pd.Timestamp.now().date()
+    candidates = sorted(day for day in days if day < today and not store.get(day))
+    if candidates:
+        print(f"No bhavcopy found for {len(candidates)} past trading days, holidays missing from "
+              f"{HOLIDAYS_FILE}? {', '.join(str(day) for day in candidates)}")
+    return candidates
+
+def crawl_data(extract=True, mode="http"):
+    """
+    Download the trading days missing from the stocks table, holes earlier in the
+    history included; weekends and holidays (see TradingCalendar) are never requested.
+    mode="http" fetches the per-day archives directly and falls back to the browser
+    for the days it could not get, mode="browser" drives the Playwright crawler only,
+    mode="windows" splits the ranges into CRAWL_WINDOW_DAYS windows crawled in parallel
+    browser contexts, skipping the days already in the archive store.
+    Returns the past trading days that are still missing from the archive store afterwards:
+    holidays missing from the list or days the sources failed on. The holiday list is never
+    changed here; confirm them first, then TradingCalendar().add_holidays(days).
+    """
+    if mode not in CRAWL_MODES:
+        raise ValueError(f"Invalid mode parameter. Must be one of {CRAWL_MODES}.")
+    calendar = TradingCalendar()
+    ranges = calendar.missing_ranges(con)
+    if not ranges:
+        print("No missing trading days to crawl.")
+        return []
+
+    print(f"Crawling {len(ranges)} missing ranges: {', '.join(f'{start} to {end}' for start, end in ranges)}")
+    days = [day for start, end in ranges for day in calendar.trading_days(start, end)]
+    if mode == "http":
+        from downloader import BhavcopyDownloader
+        downloader = BhavcopyDownloader(extract=extract)
+        statuses = downloader.crawl_days(days)
+        # a 404 is not proof of a holiday (not published yet, a stale URL): retry those too
+        failed = sorted(day for day, status in statuses.items()
+                        if status in (BhavcopyDownloader.MISSING, BhavcopyDownloader.FAILED))
+        if failed:
+            print(f"{len(failed)} days not downloaded over HTTP, falling back to the browser for {failed[0]} to {failed[-1]}")
+            from crawler import Crawler
+            Crawler(extract=extract, store=downloader.store).crawl(str(failed[0]), str(failed[-1]))
+        return holiday_candidates(failed, downloader.store)
+    elif mode == "windows":
+        from crawler import Crawler
+        crawler = Crawler(extract=extract)
+        failed = crawler.crawl_windows(ranges)
+        if failed:
+            print(f"{len(failed)} windows failed, rerun to retry them: {failed}")
+        return holiday_candidates(days, crawler.store)
     else:
-        print(f"No new data to crawl.\nLatest crawled date -> {last_crawled_date}\nToday's date -> {to_date}")
+        from crawler import Crawler
+        crawler = Crawler(extract=extract)
+        for start, end in ranges:
+            crawler.crawl(str(start), str(end))
+        return holiday_candidates(days, crawler.store)
+
+def run_pipeline(window_days=CRAWL_WINDOW_DAYS, queue_size=PIPELINE_QUEUE_SIZE, refresh_nifty_fifty=True,
+                 apply_actions=False):
+    """
+    Download, clean and load the missing trading days with overlapping stages (see PipelineRunner),
+    then refresh the NIFTY 50 tables, their highs and lows and the corporate actions.
+    Corporate actions are only reported (a batch dry run) unless apply_actions=True applies
+    the ones the AUTO_APPROVE_* policy approves.
+    Days the HTTP download could not get are retried with the browser, as in crawl_data, and
+    the past ones still missing are printed as holiday candidates.
+    Returns the per-stage throughput report.
+    """
+    from pipeline_runner import PipelineRunner
+    ranges = TradingCalendar().missing_ranges(con)
+    runner = PipelineRunner(con, window_days, queue_size)
+    report = runner.run(ranges)
+    print(f"Pipeline throughput:\n{report}")
+
+    failed = sorted(runner.not_downloaded)
+    if failed:
+        # same fallback as crawl_data: the browser stores what it gets, a second run loads it
+        print(f"{len(failed)} days not downloaded over HTTP, falling back to the browser for {failed[0]} to {failed[-1]}")
+        from crawler import Crawler
+        store = runner.downloader.store
+        Crawler(extract=False, store=store).crawl(str(failed[0]), str(failed[-1]))
+        retried = [day for day in failed if store.get(day)]
+        if retried:
+            PipelineRunner(con, window_days, queue_size).run([(day, day) for day in retried])
+        holiday_candidates(failed, store)
+    StocksPipeline(con).update_the_crawled_till_date()
+
+    if refresh_nifty_fifty:
+        load_nifty_fifty_stocks_list_to_db()
+        load_nifty_fifty_stocks_to_db()
+        # highs and lows are on adjusted prices: apply new actions first
+        adjust_price(batch=True, dry_run=not apply_actions)
+        update_nifty_fifty_highs_lows(incremental=True)
+    return report
 
 # crawl_data()
 # load_stocks_history_data(overwrite=False)
@@ -1,7 +1,6 @@
 # duckdb_loader.py
 import os
 import re
-import json
 import glob
 import logging
 from pathlib import Path
@@ -9,8 +8,10 @@ from pathlib import Path
 import pandas as pd
 import duckdb
 
+from cleaner import Cleaner
 from duckdb_manager import DuckDBManager
-from constants import CSV_FOLDER, DUCKDB_PATH, PARQUET_OUT, ERROR_LOG, CREATE_PARTITIONED_PARQUET, ORDERED_CSV_COLUMNS
+from rejected_rows import RejectedRows
+from constants import CSV_FOLDER, DUCKDB_PATH, ORDERED_CSV_COLUMNS
 
 # ------------------------
 # Logging setup
@@ -21,51 +22,6 @@ logger = logging.getLogger("duckdb_loader")
 # ------------------------
 # Helpers
 # ------------------------
-def excel_serial_to_timestamp(s):
-    """Convert Excel serial (e.g. '45470') to pandas.Timestamp.
-       Uses anchor 1899-12-30 which is the common way to convert Excel dates.
-    """
-    try:
-        n = float(s)
-        # treat negative/zero or extremely large numbers as invalid
-        if n <= 0 or n > 60000:
-            return pd.NaT
-        return pd.Timestamp('1899-12-30') + pd.to_timedelta(int(n), unit='D')
-    except Exception:
-        return pd.NaT
-
-def parse_date_string(s):
-    """Robust date parser for TIMESTAMP values.
-       Handles:
-         - '01-APR-2016'  -> %d-%b-%Y
-         - '2-Jun-25'     -> %d-%b-%y
-         - '45470'        -> Excel serial
-         - other common formats via pandas.to_datetime fallback
-    """
-    if pd.isna(s):
-        return pd.NaT
-    s = str(s).strip()
-    if s == "":
-        return pd.NaT
-
-    # If purely numeric (like Excel serial)
-    if re.fullmatch(r'\d+(\.0+)?', s):
-        return excel_serial_to_timestamp(s)
-
-    # Try explicit known formats first
-    fmts = ("%d-%b-%Y", "%d-%b-%y", "%d-%b-%Y %H:%M:%S", "%d-%b-%y %H:%M:%S")
-    for fmt in fmts:
-        try:
-            return pd.to_datetime(s, format=fmt, dayfirst=True)
-        except Exception:
-            pass
-
-    # Fallback: let pandas infer
-    try:
-        return pd.to_datetime(s, dayfirst=True, infer_datetime_format=True, errors='coerce')
-    except Exception:
-        return pd.NaT
-
 def clean_string_columns(df):
     """Trim and uppercase all string columns (object dtype).
        We purposely convert all columns to str first because read_csv used dtype=str.
@@ -128,12 +84,8 @@ def main():
     """)
     logger.info("Ensured stocks table exists in DuckDB")
 
-    # prepare errors log file header if not exists
-    errors_header = [
-        "source_file", "row_index", "error_reason", "raw_timestamp", "raw_row_json"
-    ]
-    if not os.path.exists(ERROR_LOG):
-        pd.DataFrame(columns=errors_header).to_csv(ERROR_LOG, index=False)
+    # bad rows are quarantined in the rejected rows table
+    rejected_rows = RejectedRows(con)
 
     total_rows = 0
     total_inserted = 0
@@ -148,14 +100,7 @@ def main():
             df = pd.read_csv(path, dtype=str, header=0, skip_blank_lines=True)
         except Exception as e:
             logger.exception("Failed to read CSV %s — logging as error", fname)
-            err_row = {
-                "source_file": fname,
-                "row_index": -1,
-                "error_reason": f"CSV_READ_ERROR: {e}",
-                "raw_timestamp": "",
-                "raw_row_json": ""
-            }
-            pd.DataFrame([err_row]).to_csv(ERROR_LOG, index=False, mode="a", header=False)
+            rejected_rows.insert_error(fname, f"CSV_READ_ERROR: {e}")
             total_errors += 1
             continue
 
@@ -175,39 +120,31 @@ def main():
         df = convert_numeric_columns(df)
 
         # Parse dates robustly
-        df["PARSED_TRADE_DATE"] = df["TIMESTAMP"].apply(parse_date_string)
+        df["PARSED_TRADE_DATE"] = Cleaner.parse_dates(df["TIMESTAMP"])
 
         # Determine invalid rows:
         # - SYMBOL missing
         # - PARSED_TRADE_DATE is NaT (unparseable)
-        invalid_mask = (
+        missing_symbol_mask = (
             df.get("SYMBOL", pd.Series([], dtype=object)).isna() |
-            (df.get("SYMBOL", pd.Series([], dtype=object)).astype(str).str.strip() == "") |
-            df["PARSED_TRADE_DATE"].isna()
+            (df.get("SYMBOL", pd.Series([], dtype=object)).astype(str).str.strip() == "")
         )
+        invalid_date_mask = df["PARSED_TRADE_DATE"].isna()
+        invalid_mask = missing_symbol_mask | invalid_date_mask
 
         df_invalid = df[invalid_mask].copy()
         df_valid = df[~invalid_mask].copy()
 
         # Log invalid rows
         if not df_invalid.empty:
-            rows_to_log = []
-            for idx, row in df_invalid.iterrows():
-                reason = []
-                if pd.isna(row.get("SYMBOL")) or str(row.get("SYMBOL")).strip() == "":
-                    reason.append("MISSING_SYMBOL")
-                if pd.isna(row.get("PARSED_TRADE_DATE")):
-                    reason.append("INVALID_DATE")
-                rows_to_log.append({
-                    "source_file": fname,
-                    "row_index": int(idx),
-                    "error_reason": "|".join(reason),
-                    "raw_timestamp": row.get("TIMESTAMP", ""),
-                    "raw_row_json": json.dumps(row.drop(labels=["PARSED_TRADE_DATE"]).fillna("").to_dict(), ensure_ascii=False)
-                })
-            pd.DataFrame(rows_to_log).to_csv(ERROR_LOG, index=False, mode="a", header=False)
-            total_errors += len(rows_to_log)
-            logger.info("Logged %d bad rows from %s", len(rows_to_log), fname)
+            reason = (
+                missing_symbol_mask.map({True: "MISSING_SYMBOL", False: ""})
+                .str.cat(invalid_date_mask.map({True: "INVALID_DATE", False: ""}), sep="|")
+                .str.strip("|")
+            )[invalid_mask]
+            total_errors += rejected_rows.insert_frame(
+                df_invalid.drop(columns=["PARSED_TRADE_DATE"]), reason, fname
+            )
 
         # If no valid rows, continue
         if df_valid.empty:
@@ -251,18 +188,10 @@ def main():
             logger.info("Inserted %d rows from %s into DuckDB", inserted, fname)
         except Exception as e:
             logger.exception("Failed to insert data from %s into DuckDB. Logging rows as errors.", fname)
-            # Log all rows as failed inserts (so user can inspect)
-            rows_to_log = []
-            for idx, row in df_valid.iterrows():
-                rows_to_log.append({
-                    "source_file": fname,
-                    "row_index": int(idx),
-                    "error_reason": f"DB_INSERT_ERROR: {e}",
-                    "raw_timestamp": row.get("TIMESTAMP", ""),
-                    "raw_row_json": json.dumps(row.drop(labels=["PARSED_TRADE_DATE"]).fillna("").to_dict(), ensure_ascii=False)
-                })
-            pd.DataFrame(rows_to_log).to_csv(ERROR_LOG, index=False, mode="a", header=False)
-            total_errors += len(rows_to_log)
+            # Quarantine all rows as failed inserts (so user can inspect)
+            total_errors += rejected_rows.insert_frame(
+                df_valid.drop(columns=["PARSED_TRADE_DATE"]), f"DB_INSERT_ERROR: {e}", fname
+            )
 
     # finished processing files
     logger.info("Processing complete. inserted=%d errors=%d", total_inserted, total_errors)
@@ -3,6 +3,31 @@ import os
 import atexit
 import threading
 
+# ids of the connections currently inside run_in_transaction
+_open_transactions = set()
+
+
+def run_in_transaction(con, func, *args):
+    """
+    Run func(*args) in one DuckDB transaction on `con`, rolling back if it raises.
+    Called again while a run_in_transaction on the same connection is open, func joins that
+    transaction instead of starting another, and the outer caller commits or rolls back.
+    """
+    if id(con) in _open_transactions:
+        return func(*args)
+    con.execute("BEGIN TRANSACTION")
+    _open_transactions.add(id(con))
+    try:
+        result = func(*args)
+        con.execute("COMMIT")
+        return result
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        _open_transactions.discard(id(con))
+
+
 class DuckDBManager:
     """
     A singleton-style DuckDB connection manager.
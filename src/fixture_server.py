@@ -0,0 +1,122 @@
+"""
+Local stand-in for the bhavcopy archive server, for exercising BhavcopyDownloader offline.
+It serves a synthetic ZIP for every weekday, 404 for weekends and `holidays`, and can
+add latency and fail the first requests for each day to exercise the retries.
+"""
+import io
+import random
+import re
+import threading
+import time
+import zipfile
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from constants import ORDERED_CSV_COLUMNS, TRADE_DATE
+
+
+ARCHIVE_PATH = re.compile(r"/cm(\d{2})([A-Z]{3})(\d{4})bhav\.csv\.zip$")
+
+
+def bhavcopy_zip(day, symbols):
+    """A bhavcopy ZIP for `day` with one row per symbol, member named like NSE's."""
+    columns = [col for col in ORDERED_CSV_COLUMNS if col != TRADE_DATE]
+    rng = random.Random(day.toordinal())
+    lines = [",".join(columns)]
+    for i in range(symbols):
+        price = rng.uniform(10, 3000)
+        lines.append(
+            f"SYM{i},EQ,{price:.2f},{price * 1.02:.2f},{price * 0.98:.2f},{price:.2f},{price:.2f},"
+            f"{price:.2f},{rng.randint(100, 100000)},{price * 1000:.2f},{day:%d-%b-%Y},"
+            f"{rng.randint(1, 500)},INE{i:06d}"
+        )
+    member = f"cm{day:%d}{f'{day:%b}'.upper()}{day:%Y}bhav.csv"
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(member, "\n".join(lines) + "\n")
+    return buffer.getvalue()
+
+
+class BhavcopyFixtureServer:
+    """
+    Threaded HTTP server on 127.0.0.1, use as a context manager:
+
+        with BhavcopyFixtureServer(fail_first=1) as server:
+            BhavcopyDownloader(url=server.url, ...).crawl("2024-01-01", "2024-03-31")
+    """
+
+    def __init__(self, symbols=2000, latency=0.0, fail_first=0, holidays=()):
+        self.symbols = symbols
+        self.latency = latency
+        self.fail_first = fail_first
+        self.holidays = set(holidays)
+        self.requests = 0
+        self._attempts = dict()
+        self._archives = dict()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        """URL template in the format of BHAVCOPY_URL."""
+        port = self._server.server_address[1]
+        return f"http://127.0.0.1:{port}/content/historical/EQUITIES/{{year}}/{{month}}/cm{{day}}{{month}}{{year}}bhav.csv.zip"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, headers, body = server.respond(self.path, self.headers.get("If-Modified-Since"))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def respond(self, path, if_modified_since=None):
+        """(status, headers, body) for a request."""
+        if self.latency:
+            time.sleep(self.latency)
+        match = ARCHIVE_PATH.search(path)
+        if not match:
+            return 404, {}, b""
+        try:
+            day = datetime.strptime("".join(match.groups()), "%d%b%Y").date()
+        except ValueError:
+            return 404, {}, b""
+        if day.weekday() >= 5 or day in self.holidays:
+            return 404, {}, b""
+
+        with self._lock:
+            self.requests += 1
+            attempts = self._attempts[day] = self._attempts.get(day, 0) + 1
+            if attempts <= self.fail_first:
+                return 503, {}, b""
+            if day not in self._archives:
+                self._archives[day] = bhavcopy_zip(day, self.symbols)
+            body = self._archives[day]
+
+        # published in the evening (IST) of the trade date
+        published = datetime(day.year, day.month, day.day, 12, 30, tzinfo=timezone.utc)
+        if if_modified_since and parsedate_to_datetime(if_modified_since) >= published:
+            return 304, {}, b""
+        return 200, {"Content-Type": "application/zip", "Last-Modified": format_datetime(published, usegmt=True)}, body
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import zipfile
+from datetime import datetime
+
+from constants import INGEST_MANIFEST_TABLE, logger
+
+
+class IngestManifest:
+    """
+    Tracks which CSVs have been loaded into the stocks table.
+    A row is written in the same transaction as the file's data, so the
+    manifest and the stocks table can never disagree after a crash.
+    """
+
+    def __init__(self, con):
+        self.con = con
+        self._hashes = dict()
+        self._init_table()
+
+    def _init_table(self):
+        create_manifest_table_query = f"""
+            CREATE TABLE IF NOT EXISTS {INGEST_MANIFEST_TABLE} (
+                filename VARCHAR PRIMARY KEY,
+                file_size BIGINT,
+                file_mtime DOUBLE,
+                content_hash VARCHAR,
+                rows_read BIGINT,
+                rows_loaded BIGINT,
+                rows_inserted BIGINT,
+                rows_updated BIGINT,
+                rows_skipped BIGINT,
+                loaded_at TIMESTAMP
+            )
+        """
+        self.con.execute(create_manifest_table_query)
+        logger.info("Ensured '%s' table exists", INGEST_MANIFEST_TABLE)
+
+    def content_hash(self, file_path):
+        """sha256 of the file, cached for the lifetime of this manifest object."""
+        if file_path not in self._hashes:
+            sha = hashlib.sha256()
+            with open(file_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    sha.update(block)
+            self._hashes[file_path] = sha.hexdigest()
+        return self._hashes[file_path]
+
+    def fingerprint(self, source):
+        """
+        (size, mtime, content hash) of a loaded source: a file path, or the ZipInfo of
+        a CSV read straight out of an archive (hashed by its CRC32, no decompression needed).
+        """
+        if isinstance(source, zipfile.ZipInfo):
+            return source.file_size, datetime(*source.date_time).timestamp(), f"crc32:{source.CRC:08x}"
+        stat = os.stat(source)
+        return stat.st_size, stat.st_mtime, self.content_hash(source)
+
+    def members_to_load(self, archive_name, members, overwrite=False):
+        """
+        Return the ZipInfo members of an archive that need loading.
+        Members are keyed as '<archive_name>/<member>' and compared by size, date and CRC32.
+        """
+        if overwrite:
+            return list(members)
+
+        rows = self.con.execute(f"""
+            SELECT filename, file_size, file_mtime, content_hash FROM {INGEST_MANIFEST_TABLE}
+            WHERE starts_with(filename, ?)
+        """, [f"{archive_name}/"]).fetchall()
+        manifest = {row[0]: tuple(row[1:]) for row in rows}
+
+        to_load = [info for info in members
+                   if manifest.get(f"{archive_name}/{info.filename}") != self.fingerprint(info)]
+        logger.info("%d of %d members of %s need loading", len(to_load), len(members), archive_name)
+        return to_load
+
+    def files_to_load(self, folder, filenames, overwrite=False):
+        """
+        Return the files that need loading.
+        A file whose size and mtime match its manifest row is skipped without reading it,
+        a file whose size or mtime changed is hashed and only reloaded if the content changed.
+        """
+        if overwrite:
+            return list(filenames)
+
+        rows = self.con.execute(
+            f"SELECT filename, file_size, file_mtime, content_hash FROM {INGEST_MANIFEST_TABLE}"
+        ).fetchall()
+        manifest = {row[0]: row[1:] for row in rows}
+
+        to_load = []
+        touched = []
+        for filename in filenames:
+            entry = manifest.get(filename)
+            if entry is None:
+                to_load.append(filename)
+                continue
+
+            file_path = os.path.join(folder, filename)
+            stat = os.stat(file_path)
+            file_size, file_mtime, content_hash = entry
+            if stat.st_size == file_size and stat.st_mtime == file_mtime:
+                continue
+            if self.content_hash(file_path) == content_hash:
+                # same content, only the mtime moved; remember it to skip the hash next time
+                touched.append((stat.st_size, stat.st_mtime, filename))
+                continue
+
+            logger.info("Content of %s changed since it was loaded", filename)
+            to_load.append(filename)
+
+        if touched:
+            self.con.executemany(
+                f"UPDATE {INGEST_MANIFEST_TABLE} SET file_size = ?, file_mtime = ? WHERE filename = ?",
+                touched
+            )
+        logger.info("%d of %d files need loading", len(to_load), len(filenames))
+        return to_load
+
+    def record(self, filename, source, rows_read, rows_loaded, merge_counts=None):
+        """
+        Write the manifest row for a file; call inside the transaction that loaded it.
+        source is the file path or ZipInfo (see fingerprint),
+        merge_counts is the file's entry from StocksPipeline.merge_into_main, if any.
+        """
+        file_size, file_mtime, content_hash = self.fingerprint(source)
+        merge_counts = merge_counts or dict()
+        self.con.execute(f"""
+            INSERT INTO {INGEST_MANIFEST_TABLE}
+                (filename, file_size, file_mtime, content_hash, rows_read, rows_loaded,
+                 rows_inserted, rows_updated, rows_skipped, loaded_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (filename) DO UPDATE SET
+                file_size = excluded.file_size,
+                file_mtime = excluded.file_mtime,
+                content_hash = excluded.content_hash,
+                rows_read = excluded.rows_read,
+                rows_loaded = excluded.rows_loaded,
+                rows_inserted = excluded.rows_inserted,
+                rows_updated = excluded.rows_updated,
+                rows_skipped = excluded.rows_skipped,
+                loaded_at = excluded.loaded_at
+        """, [filename, file_size, file_mtime, content_hash,
+              rows_read, rows_loaded, merge_counts.get("inserted", 0),
+              merge_counts.get("updated", 0), merge_counts.get("skipped", 0), datetime.now()])
@@ -1,11 +1,19 @@
+from datetime import timedelta
+
+import pandas as pd
+
+from duckdb_manager import run_in_transaction
 from constants import (NIFTY_FIFTY_TABLE, SYMBOL, NIFTY_FIFTY, logger, TRADE_DATE,
-                       NIFTY_FIFTY_LIST_TABLE, STOCK_TABLE, NIFTY_FIFTY_COL_TYPES)
+                       NIFTY_FIFTY_LIST_TABLE, STOCK_TABLE, NIFTY_FIFTY_COL_TYPES, SUPPORTED_WEEKS,
+                       HIGH_LOW_WATERMARK_TABLE, NIFTY_FIFTY_SYNC_TABLE, ADJUSTED_VIEW_SUFFIX)
 
 class NiftyFiftyStocks:
     def __init__(self, con):
         self.con = con
         self._init_nifty_fifty_list_table()
         self._init_nifty_fifty_table()
+        self._init_nifty_fifty_sync_table()
+        self._init_high_low_watermark_table()
 
     def _init_nifty_fifty_list_table(self):
         create_nifty_fifty_list_table_query = f"""
@@ -31,6 +39,10 @@ class NiftyFiftyStocks:
         """
 
         self.con.execute(create_table_query)
+
+        # tables created before a column was added to NIFTY_FIFTY_COL_TYPES
+        for col, col_type in NIFTY_FIFTY_COL_TYPES.items():
+            self.con.execute(f"ALTER TABLE {NIFTY_FIFTY_TABLE} ADD COLUMN IF NOT EXISTS {col.lower()} {col_type}")
         logger.info("Ensured '%s' table exists", NIFTY_FIFTY_TABLE)
 
     def upsert_stocks_to_nifty_fifty_list(self):
@@ -43,8 +55,10 @@ class NiftyFiftyStocks:
         for stock in NIFTY_FIFTY:
             self.con.execute(upsert_query, (stock,))
 
-    def upsert_stocks_to_nifty_fifty_from_all_stocks(self):
-        base_columns = [
+    @staticmethod
+    def _base_columns():
+        """NIFTY_FIFTY_COL_TYPES columns copied from stocks, i.e. all but the highs and lows."""
+        return [
             c for c in NIFTY_FIFTY_COL_TYPES.keys()
             if not c.upper().endswith("52") and not c.upper().endswith("52_DATE")
             and not c.upper().endswith("4") and not c.upper().endswith("4_DATE")
@@ -52,6 +66,10 @@ class NiftyFiftyStocks:
             and not c.upper().endswith("24") and not c.upper().endswith("24_DATE")
         ]
 
+    def upsert_stocks_to_nifty_fifty_from_all_stocks(self):
+        """Copy every stocks row of the listed symbols, see sync_nifty_fifty for the incremental version."""
+        base_columns = self._base_columns()
+
         insert_columns = ", ".join([f"{c.lower()}" for c in base_columns])
         select_columns = ", ".join([f"s.{c.lower()}" for c in base_columns])
         
@@ -67,25 +85,133 @@ class NiftyFiftyStocks:
 
         self.con.execute(nifty50_insert_query)
 
+    def synced_till(self):
+        """{symbol: last stocks trade date synced into nifty_fifty} of the listed symbols, None if never synced."""
+        rows = self.con.execute(f"""
+            SELECT n.{SYMBOL}, w.synced_till
+            FROM {NIFTY_FIFTY_LIST_TABLE} n
+            LEFT JOIN {NIFTY_FIFTY_SYNC_TABLE} w ON n.{SYMBOL} = w.{SYMBOL}
+        """).fetchall()
+        return dict(rows)
+
+    def dirty_since(self):
+        """
+        Earliest stocks trade date loaded at or before a listed symbol's synced_till since its
+        last sync (recorded by StocksPipeline.merge_into_main), None if there is none.
+        """
+        return self.con.execute(f"""
+            SELECT MIN(w.dirty_since)
+            FROM {NIFTY_FIFTY_SYNC_TABLE} w
+            JOIN {NIFTY_FIFTY_LIST_TABLE} n ON n.{SYMBOL} = w.{SYMBOL}
+        """).fetchone()[0]
+
+    def sync_nifty_fifty(self, since=None):
+        """
+        Copy the stocks rows added since the last sync instead of joining all of stocks again:
+        rows after the listed symbols' oldest watermark, plus the full history of symbols
+        newly added to the list (backfilled once). Rows loaded before a watermark (older CSVs,
+        holes filled by a crawl) are picked up from the symbols' dirty_since, and since=<date>
+        (a date or a string such as "2024-01-01") also resyncs the rows after that date.
+        Returns the number of rows inserted.
+        """
+        if since is not None:
+            since = pd.Timestamp(since).date()
+        base_columns = self._base_columns()
+        insert_columns = ", ".join([f"{c.lower()}" for c in base_columns])
+        select_columns = ", ".join([f"s.{c.lower()}" for c in base_columns])
+
+        def sync(since):
+            till = self.con.execute(f"SELECT MAX({TRADE_DATE}) FROM {STOCK_TABLE}").fetchone()[0]
+            if till is None:
+                logger.warning("No rows in %s to sync into %s", STOCK_TABLE, NIFTY_FIFTY_TABLE)
+                return 0, None, since, []
+
+            watermarks = self.synced_till()
+            new_symbols = sorted(symbol for symbol, synced in watermarks.items() if synced is None)
+            synced = [synced for synced in watermarks.values() if synced is not None]
+            dirty = self.dirty_since()
+            if dirty is not None:
+                synced.append(dirty - timedelta(days=1))
+            if synced:
+                since = min(synced) if since is None else min(since, min(synced))
+
+            insert_query = f"""
+                INSERT INTO {NIFTY_FIFTY_TABLE} ({insert_columns})
+                SELECT {select_columns}
+                FROM {STOCK_TABLE} s
+                JOIN {NIFTY_FIFTY_LIST_TABLE} n
+                ON s.{SYMBOL.lower()} = n.{SYMBOL.lower()}
+                WHERE s.{TRADE_DATE} <= DATE '{till}' AND {{delta_filter}}
+                ON CONFLICT ({SYMBOL.lower()}, {TRADE_DATE.lower()}) DO NOTHING
+            """
+            inserted = 0
+            if since is not None:
+                # a literal date lets DuckDB skip the row groups of stocks before it
+                inserted += self.con.execute(insert_query.format(
+                    delta_filter=f"s.{TRADE_DATE} > DATE '{since}'")).fetchone()[0]
+            if new_symbols:
+                inserted += self.con.execute(insert_query.format(
+                    delta_filter=f"s.{SYMBOL} IN (SELECT UNNEST(?::VARCHAR[]))"), [new_symbols]).fetchone()[0]
+
+            self.con.execute(f"""
+                INSERT INTO {NIFTY_FIFTY_SYNC_TABLE} ({SYMBOL}, synced_till, dirty_since, synced_at)
+                SELECT {SYMBOL}, DATE '{till}', NULL, now() FROM {NIFTY_FIFTY_LIST_TABLE}
+                ON CONFLICT ({SYMBOL}) DO UPDATE SET
+                    synced_till = excluded.synced_till,
+                    dirty_since = excluded.dirty_since,
+                    synced_at = excluded.synced_at
+            """)
+            return inserted, till, since, new_symbols
+
+        inserted, till, since, new_symbols = run_in_transaction(self.con, sync, since)
+        if till is None:
+            return 0
+
+        logger.info("Synced %d rows into %s up to %s (after %s, %d symbols backfilled)",
+                    inserted, NIFTY_FIFTY_TABLE, till, since, len(new_symbols))
+        return inserted
+
+    @staticmethod
+    def high_low_columns(weeks: int):
+        """(high, high date, low, low date) column names of a window."""
+        return (f"WEEK_HIGH_{weeks}", f"WEEK_HIGH_{weeks}_DATE", f"WEEK_LOW_{weeks}", f"WEEK_LOW_{weeks}_DATE")
+
+    def price_source(self):
+        """
+        nifty_fifty_adjusted when it exists (GeneralMeeting creates it), so that highs and lows are
+        on corporate-action adjusted prices; nifty_fifty itself before any GeneralMeeting.
+        """
+        adjusted = f"{NIFTY_FIFTY_TABLE}{ADJUSTED_VIEW_SUFFIX}"
+        exists = self.con.execute("""
+            SELECT (SELECT COUNT(*) FROM duckdb_views() WHERE view_name = ?)
+                 + (SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?)
+        """, [adjusted, adjusted]).fetchone()[0]
+        return adjusted if exists else NIFTY_FIFTY_TABLE
+
     def update_high_and_low(self, weeks: int, overwrite: bool = False):
-        if weeks not in [4, 12, 24, 52]:
-            raise ValueError("Invalid weeks parameter. Must be one of [4, 12, 24, 52].")
+        """
+        Highs and lows of one window with a self-join on the date range.
+        Kept for comparison, update_highs_and_lows computes every window in one pass.
+        """
+        if weeks not in SUPPORTED_WEEKS:
+            raise ValueError(f"Invalid weeks parameter. Must be one of {SUPPORTED_WEEKS}.")
         
         high_col = f"WEEK_HIGH_{str(weeks)}"
         high_date_col = f"WEEK_HIGH_{str(weeks)}_DATE"
         low_col = f"WEEK_LOW_{str(weeks)}"
         low_date_col = f"WEEK_LOW_{str(weeks)}_DATE"
+        source = self.price_source()
 
         calculation_query = f"""
             SELECT 
                 t1.{SYMBOL},
                 t1.{TRADE_DATE},
-                MIN(t2.high) AS {low_col},
-                MIN_BY(t2.{TRADE_DATE}, t2.high) AS {low_date_col},
+                MIN(t2.low) AS {low_col},
+                MIN_BY(t2.{TRADE_DATE}, t2.low) AS {low_date_col},
                 MAX(t2.high) AS {high_col},
                 MAX_BY(t2.{TRADE_DATE}, t2.high) AS {high_date_col}
-            FROM {NIFTY_FIFTY_TABLE} t1
-            JOIN {NIFTY_FIFTY_TABLE} t2
+            FROM {source} t1
+            JOIN {source} t2
                 ON t1.{SYMBOL} = t2.{SYMBOL}
                 AND t2.{TRADE_DATE} BETWEEN t1.{TRADE_DATE} - INTERVAL {weeks} WEEK 
                                            AND t1.{TRADE_DATE}
@@ -126,4 +252,143 @@ class NiftyFiftyStocks:
             """
 
         logger.info(f"Updating {NIFTY_FIFTY_TABLE} for high and low of {weeks} weeks")
-        self.con.execute(update_query)
\ No newline at end of file
+        self.con.execute(update_query)
+
+    def _init_nifty_fifty_sync_table(self):
+        create_sync_table_query = f"""
+            CREATE TABLE IF NOT EXISTS {NIFTY_FIFTY_SYNC_TABLE} (
+                {SYMBOL} VARCHAR PRIMARY KEY,
+                synced_till DATE,
+                dirty_since DATE,
+                synced_at TIMESTAMP
+            )
+        """
+        self.con.execute(create_sync_table_query)
+        # sync tables created before dirty_since was recorded
+        self.con.execute(f"ALTER TABLE {NIFTY_FIFTY_SYNC_TABLE} ADD COLUMN IF NOT EXISTS dirty_since DATE")
+        logger.info("Ensured '%s' table exists", NIFTY_FIFTY_SYNC_TABLE)
+
+    def _init_high_low_watermark_table(self):
+        create_watermark_table_query = f"""
+            CREATE TABLE IF NOT EXISTS {HIGH_LOW_WATERMARK_TABLE} (
+                weeks INTEGER PRIMARY KEY,
+                computed_till DATE,
+                updated_at TIMESTAMP
+            )
+        """
+        self.con.execute(create_watermark_table_query)
+        logger.info("Ensured '%s' table exists", HIGH_LOW_WATERMARK_TABLE)
+
+    def high_low_watermarks(self, weeks=SUPPORTED_WEEKS):
+        """{weeks: last trade date whose highs and lows are computed, or None}"""
+        rows = self.con.execute(f"SELECT weeks, computed_till FROM {HIGH_LOW_WATERMARK_TABLE}").fetchall()
+        watermarks = dict(rows)
+        return {w: watermarks.get(w) for w in weeks}
+
+    def update_highs_and_lows(self, weeks=SUPPORTED_WEEKS, overwrite: bool = False, since=None):
+        """
+        Highs and lows of all the given windows in one pass over the table.
+        Each window is a RANGE frame of `weeks` weeks up to the current row, so the
+        aggregates slide along each symbol's rows instead of joining every row with its
+        window. overwrite=False only updates rows missing any of the values.
+
+        Prices are read from price_source(), i.e. adjusted for the corporate actions
+        recorded so far; a new adjustment factor clears its symbol's values
+        (GeneralMeeting.reset_highs_and_lows) so that the next run recomputes them.
+
+        since=<date> only computes rows after that date, reading just the lookback slice
+        they need, plus every row of symbols with values missing up to that date
+        (e.g. a symbol backfilled or adjusted after the last run).
+        The windows' watermarks are moved to the last trade date afterwards, in the same
+        transaction (or in the caller's, see duckdb_manager.run_in_transaction).
+        """
+        weeks = list(weeks)
+        invalid = [w for w in weeks if w not in SUPPORTED_WEEKS]
+        if invalid:
+            raise ValueError(f"Invalid weeks parameter {invalid}. Must be among {SUPPORTED_WEEKS}.")
+
+        columns = [col for w in weeks for col in self.high_low_columns(w)]
+        aggregates = []
+        windows = []
+        for w in weeks:
+            high_col, high_date_col, low_col, low_date_col = self.high_low_columns(w)
+            aggregates += [
+                f"MAX(high) OVER w{w} AS {high_col}",
+                f"ARG_MAX({TRADE_DATE}, high) OVER w{w} AS {high_date_col}",
+                f"MIN(low) OVER w{w} AS {low_col}",
+                f"ARG_MIN({TRADE_DATE}, low) OVER w{w} AS {low_date_col}",
+            ]
+            windows.append(f"""w{w} AS (
+                PARTITION BY {SYMBOL} ORDER BY {TRADE_DATE}
+                RANGE BETWEEN INTERVAL {w} WEEK PRECEDING AND CURRENT ROW
+            )""")
+
+        missing_clause = " OR ".join([f"{col} IS NULL" for col in columns])
+        source_filter = "TRUE"
+        target_filter = "TRUE"
+        if since is not None:
+            stale_symbols = f"""
+                {SYMBOL} IN (
+                    SELECT DISTINCT {SYMBOL} FROM {NIFTY_FIFTY_TABLE}
+                    WHERE {TRADE_DATE} <= DATE '{since}' AND ({missing_clause})
+                )
+            """
+            source_filter = f"{TRADE_DATE} > DATE '{since}' - INTERVAL {max(weeks)} WEEK OR {stale_symbols}"
+            target_filter = f"{TRADE_DATE} > DATE '{since}' OR {stale_symbols}"
+
+        calculation_query = f"""
+            SELECT * FROM (
+                SELECT {SYMBOL}, {TRADE_DATE}, {", ".join(aggregates)}
+                FROM {self.price_source()}
+                WHERE {source_filter}
+                WINDOW {", ".join(windows)}
+            )
+            WHERE {target_filter}
+        """
+        set_clause = ",\n".join([f"{col} = subquery.{col}" for col in columns])
+
+        update_query = f"""
+            UPDATE {NIFTY_FIFTY_TABLE} AS nf
+            SET {set_clause}
+            FROM (
+                {calculation_query}
+            ) AS subquery
+            WHERE nf.{SYMBOL} = subquery.{SYMBOL}
+              AND nf.{TRADE_DATE} = subquery.{TRADE_DATE}
+              {"" if overwrite else "AND (" + " OR ".join([f"nf.{col} IS NULL" for col in columns]) + ")"}
+        """
+
+        logger.info(f"Updating {NIFTY_FIFTY_TABLE} for highs and lows of {weeks} weeks"
+                    + (f" after {since}" if since is not None else ""))
+
+        def update():
+            self.con.execute(update_query)
+            self.con.execute(f"""
+                INSERT INTO {HIGH_LOW_WATERMARK_TABLE} (weeks, computed_till, updated_at)
+                SELECT w.weeks, (SELECT MAX({TRADE_DATE}) FROM {NIFTY_FIFTY_TABLE}), now()
+                FROM (SELECT UNNEST(?::INTEGER[]) AS weeks) w
+                ON CONFLICT (weeks) DO UPDATE SET
+                    computed_till = excluded.computed_till,
+                    updated_at = excluded.updated_at
+            """, [weeks])
+
+        run_in_transaction(self.con, update)
+
+    def update_highs_and_lows_incremental(self, weeks=SUPPORTED_WEEKS):
+        """
+        Compute highs and lows only for the rows added since the windows' watermarks,
+        so a daily run costs the new rows plus their lookback rather than the whole history.
+        Falls back to a full pass for windows never computed. Symbols whose values were cleared
+        (newly adjusted ones) are recomputed in full. Prices changed in place below the
+        watermark (e.g. by a reload with overwrite=True) need a full pass.
+        """
+        watermarks = self.high_low_watermarks(weeks)
+        since = None if None in watermarks.values() else min(watermarks.values())
+        missing_clause = " OR ".join([f"{col} IS NULL" for w in weeks for col in self.high_low_columns(w)])
+        latest, missing = self.con.execute(f"""
+            SELECT MAX({TRADE_DATE}), COUNT(*) FILTER (WHERE {missing_clause}) FROM {NIFTY_FIFTY_TABLE}
+        """).fetchone()
+        if latest is None or (since is not None and since >= latest and not missing):
+            logger.info(f"Highs and lows of {weeks} weeks are up to date")
+            return
+        self.update_highs_and_lows(weeks, overwrite=True, since=since)
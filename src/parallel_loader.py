@@ -0,0 +1,89 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from cleaner import Cleaner
+from constants import LOAD_BATCH_SIZE, LOAD_WORKERS, logger
+from stocks_pipeline import StocksPipeline
+
+
+def read_and_clean(file_path):
+    """
+    Worker: read and clean one CSV and return it as an Arrow table,
+    along with the number of rows read and the rows Cleaner rejected.
+    Runs in a separate process, so it must not touch the DuckDB connection;
+    the writer quarantines the rejected rows, or the read error of a file that could not
+    be read, along with the file's batch.
+    """
+    filename = os.path.basename(file_path)
+    cleaner = Cleaner()
+    df = StocksPipeline.read_from_csv(file_path, rejected_rows=cleaner)
+    if df.empty:
+        logger.error("No valid data found in %s", filename)
+        return filename, 0, None, cleaner.rejected
+
+    table = cleaner.clean(df, filename, as_arrow=True)
+    return filename, len(df), table, cleaner.rejected
+
+
+class ParallelLoader:
+    """
+    Reads and cleans CSVs in a pool of worker processes while a single writer
+    (this process, which owns the DuckDB connection) upserts them in batches.
+    """
+
+    def __init__(self, con, workers: int = LOAD_WORKERS, batch_size: int = LOAD_BATCH_SIZE, manifest=None,
+                 rejected_rows=None):
+        if workers < 1 or batch_size < 1:
+            raise ValueError("workers and batch_size must be at least 1.")
+        self.con = con
+        self.workers = workers
+        self.batch_size = batch_size
+        self.manifest = manifest
+        self.stocks_pipeline = StocksPipeline(con, rejected_rows=rejected_rows)
+
+    def load(self, filenames):
+        """Load the given files from CSV_FOLDER, returns the names of the files loaded."""
+        file_paths = [StocksPipeline._get_file_path(f) for f in filenames]
+        loaded_files = []
+        batch = []
+        batch_rejected = []
+        batch_errors = []
+
+        # keep a bounded number of files in flight so finished tables
+        # do not pile up in memory while the writer is busy
+        max_in_flight = self.workers + self.batch_size
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            paths = iter(file_paths)
+            for file_path in paths:
+                pending.append((file_path, executor.submit(read_and_clean, file_path)))
+                if len(pending) >= max_in_flight:
+                    break
+
+            while pending:
+                file_path, future = pending.popleft()
+                filename, rows_read, table, rejected = future.result()
+                next_path = next(paths, None)
+                if next_path is not None:
+                    pending.append((next_path, executor.submit(read_and_clean, next_path)))
+
+                if table is None:
+                    batch_errors.extend(rejected)
+                    continue
+                batch.append((filename, file_path, rows_read, table))
+                batch_rejected.append(rejected)
+
+                if len(batch) >= self.batch_size:
+                    loaded_files.extend(self.stocks_pipeline.write_batch(batch, self.manifest, batch_rejected,
+                                                                         batch_errors))
+                    batch = []
+                    batch_rejected = []
+                    batch_errors = []
+
+        if batch or batch_errors:
+            loaded_files.extend(self.stocks_pipeline.write_batch(batch, self.manifest, batch_rejected,
+                                                                 batch_errors))
+
+        logger.info("Parallel load finished, %d of %d files loaded", len(loaded_files), len(filenames))
+        return loaded_files
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import time
+import zipfile
+
+import pandas as pd
+
+from cleaner import Cleaner
+from constants import CRAWL_WINDOW_DAYS, PIPELINE_QUEUE_SIZE, logger
+from downloader import BhavcopyDownloader
+from ingest_manifest import IngestManifest
+from stocks_pipeline import StocksPipeline
+from trading_calendar import TradingCalendar
+
+
+class PipelineRunner:
+    """
+    Downloads, cleans and loads the missing trading days window by window with the three
+    stages running at the same time: while window N+1 downloads, window N is cleaned and
+    window N-1 loaded. Stages are connected by bounded queues, so a slow stage holds back
+    the ones before it instead of letting windows pile up in memory.
+    CSVs are read straight out of the archive store, nothing is extracted to CSV_FOLDER.
+    """
+
+    STAGES = ["download", "clean", "load"]
+
+    def __init__(self, con, window_days=CRAWL_WINDOW_DAYS, queue_size=PIPELINE_QUEUE_SIZE,
+                 downloader=None, overwrite=False):
+        if window_days < 1 or queue_size < 1:
+            raise ValueError("window_days and queue_size must be at least 1.")
+        self.con = con
+        self.window_days = window_days
+        self.queue_size = queue_size
+        self.downloader = downloader or BhavcopyDownloader(extract=False)
+        self.overwrite = overwrite
+        self.calendar = TradingCalendar()
+        self.stocks_pipeline = StocksPipeline(con)
+        self.manifest = IngestManifest(con)
+        # the clean stage runs in a worker thread, with its own cursor on the database
+        self.clean_manifest = IngestManifest(con.cursor())
+        self.stats = {stage: {"windows": 0, "items": 0, "busy_seconds": 0.0} for stage in self.STAGES}
+        # days the downloader could not get (404s included), for the caller to retry
+        self.not_downloaded = []
+
+    def windows(self, ranges):
+        """Split (start, end) ranges into lists of at most window_days trading days."""
+        days = [day for start, end in ranges for day in self.calendar.trading_days(start, end)]
+        return [days[i:i + self.window_days] for i in range(0, len(days), self.window_days)]
+
+    def _record(self, stage, items, started):
+        self.stats[stage]["windows"] += 1
+        self.stats[stage]["items"] += items
+        self.stats[stage]["busy_seconds"] += time.perf_counter() - started
+
+    async def _download(self, windows, clean_queue):
+        for days in windows:
+            started = time.perf_counter()
+            statuses = await self.downloader.download_days(days)
+            failed = [day for day, status in statuses.items()
+                      if status in (BhavcopyDownloader.MISSING, BhavcopyDownloader.FAILED)]
+            if failed:
+                logger.error("Could not download %d days: %s", len(failed), failed)
+                self.not_downloaded.extend(failed)
+            archives = [(day, self.downloader.store.get(day)) for day in days if self.downloader.store.get(day)]
+            self._record("download", len(archives), started)
+            await clean_queue.put(archives)
+        await clean_queue.put(None)
+
+    def _clean_window(self, archives):
+        """
+        Read and clean the CSVs of a window's archives; returns (batch entries, rejected rows,
+        read errors): the Cleaner rejects of each entry in entry order, and those of the members
+        that could not be read. This runs on a worker thread, so nothing is written here; the
+        load stage quarantines both in the window's transaction, like insert_from_zip.
+        """
+        entries = []
+        rejected = []
+        errors = []
+        for _, zip_path in archives:
+            archive_name = os.path.basename(zip_path)
+            with zipfile.ZipFile(zip_path) as zf:
+                members = [info for info in zf.infolist() if info.filename.lower().endswith(".csv")]
+                members = self.clean_manifest.members_to_load(archive_name, members, self.overwrite)
+                for info in members:
+                    cleaner = Cleaner()
+                    entry = self.stocks_pipeline.read_zip_member(zf, info, archive_name, cleaner, cleaner)
+                    if entry is not None:
+                        entries.append(entry)
+                        rejected.append(cleaner.rejected)
+                    else:
+                        errors.extend(cleaner.rejected)
+        return entries, rejected, errors
+
+    async def _clean(self, clean_queue, load_queue):
+        while (archives := await clean_queue.get()) is not None:
+            started = time.perf_counter()
+            entries, rejected, errors = await asyncio.to_thread(self._clean_window, archives)
+            self._record("clean", sum(rows_read for _, _, rows_read, _ in entries), started)
+            await load_queue.put((entries, rejected, errors))
+        await load_queue.put(None)
+
+    async def _load(self, load_queue):
+        loaded = []
+        while (item := await load_queue.get()) is not None:
+            entries, rejected, errors = item
+            started = time.perf_counter()
+            if entries or errors:
+                # rejects are written by write_batch on the worker thread, in the batch's transaction
+                loaded.extend(await asyncio.to_thread(self.stocks_pipeline.write_batch, entries, self.manifest,
+                                                      rejected, errors))
+            self._record("load", sum(len(frame) for _, _, _, frame in entries), started)
+        return loaded
+
+    async def run_async(self, ranges):
+        windows = self.windows(ranges)
+        logger.info("Pipelining %d windows of up to %d trading days", len(windows), self.window_days)
+        clean_queue = asyncio.Queue(maxsize=self.queue_size)
+        load_queue = asyncio.Queue(maxsize=self.queue_size)
+        _, _, loaded = await asyncio.gather(
+            self._download(windows, clean_queue),
+            self._clean(clean_queue, load_queue),
+            self._load(load_queue),
+        )
+        return loaded
+
+    def run(self, ranges):
+        """
+        Run the pipeline over (start, end) ranges, e.g. TradingCalendar.missing_ranges.
+        Returns the per-stage throughput report (see report); the days that could not be
+        downloaded are left in not_downloaded.
+        """
+        started = time.perf_counter()
+        loaded = asyncio.run(self.run_async(ranges))
+        report = self.report(time.perf_counter() - started)
+        logger.info("Pipeline loaded %d CSVs:\n%s", len(loaded), report)
+        return report
+
+    def report(self, wall_seconds):
+        """
+        Per-stage throughput: items are archives for download, rows read for clean
+        and rows staged for load. A stage busy for most of the wall time is the bottleneck.
+        """
+        report = pd.DataFrame.from_dict(self.stats, orient="index")
+        report["items_per_second"] = report["items"] / report["busy_seconds"].where(report["busy_seconds"] > 0)
+        report["busy_share"] = report["busy_seconds"] / wall_seconds
+        return report
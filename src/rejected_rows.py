@@ -0,0 +1,94 @@
+import uuid
+
+import pandas as pd
+
+from constants import REJECTED_ROWS_TABLE, TIMESTAMP_COLUMN, logger
+
+
+class RejectedRows:
+    """
+    Quarantine for rows that could not be loaded.
+    Rows are written in bulk from the rejected frame (or query) with a reason code,
+    the source file and the id of the run that rejected them.
+    """
+
+    def __init__(self, con, run_id=None):
+        self.con = con
+        self.run_id = run_id or str(uuid.uuid4())
+        self._init_table()
+
+    def _init_table(self):
+        create_rejected_rows_table_query = f"""
+            CREATE TABLE IF NOT EXISTS {REJECTED_ROWS_TABLE} (
+                run_id VARCHAR,
+                source_file VARCHAR,
+                row_index BIGINT,
+                error_reason VARCHAR,
+                raw_timestamp VARCHAR,
+                raw_row_json VARCHAR,
+                rejected_at TIMESTAMP
+            )
+        """
+        self.con.execute(create_rejected_rows_table_query)
+        logger.info("Ensured '%s' table exists", REJECTED_ROWS_TABLE)
+
+    def insert_frame(self, df, reason, source_file):
+        """
+        Quarantine the rows of a DataFrame; the frame index is kept as row_index.
+        reason is a reason code for all rows, or a Series of codes aligned with df.
+        """
+        if df.empty:
+            return 0
+
+        frame = df.reset_index(names="row_index")
+        if isinstance(reason, pd.Series):
+            frame["error_reason"] = reason.to_numpy()
+            reason_expr = "error_reason"
+            payload = "* EXCLUDE (row_index, error_reason)"
+        else:
+            reason_expr = "?"
+            payload = "* EXCLUDE (row_index)"
+        timestamp_expr = f"CAST({TIMESTAMP_COLUMN} AS VARCHAR)" if TIMESTAMP_COLUMN in frame.columns else "NULL"
+
+        view = f"{REJECTED_ROWS_TABLE}_frame"
+        self.con.register(view, frame)
+        try:
+            params = [self.run_id, source_file] + ([] if isinstance(reason, pd.Series) else [reason])
+            self.con.execute(f"""
+                INSERT INTO {REJECTED_ROWS_TABLE}
+                SELECT ?, ?, row_index, {reason_expr}, {timestamp_expr},
+                       to_json(struct_pack(*COLUMNS({payload}))), now()
+                FROM {view}
+            """, params)
+        finally:
+            self.con.unregister(view)
+
+        logger.info("Quarantined %d records from %s", len(frame), source_file)
+        return len(frame)
+
+    def insert_query(self, query):
+        """
+        Quarantine the result of a query returning
+        (source_file, row_index, error_reason, raw_timestamp, raw_row_json).
+        """
+        self.con.execute(f"""
+            INSERT INTO {REJECTED_ROWS_TABLE}
+            SELECT ?, source_file, row_index, error_reason, raw_timestamp, raw_row_json, now()
+            FROM ({query})
+        """, [self.run_id])
+
+    def insert_error(self, source_file, reason):
+        """Record a whole-file failure, e.g. a CSV that could not be read."""
+        self.con.execute(f"""
+            INSERT INTO {REJECTED_ROWS_TABLE} VALUES (?, ?, NULL, ?, NULL, NULL, now())
+        """, [self.run_id, source_file, reason])
+
+    def counts(self, run_id=None):
+        """Rejected rows per source file and reason, for one run or all of them."""
+        return self.con.execute(f"""
+            SELECT source_file, error_reason, COUNT(*) AS rejected
+            FROM {REJECTED_ROWS_TABLE}
+            WHERE ? IS NULL OR run_id = ?
+            GROUP BY source_file, error_reason
+            ORDER BY source_file, error_reason
+        """, [run_id, run_id]).fetchdf()
@@ -0,0 +1,240 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from duckdb_manager import run_in_transaction
+from constants import (ROLLING_EXTREMES_TABLE, ROLLING_WINDOWS, ROLLING_CHUNK_ROWS, STOCK_TABLE,
+                       SYMBOL, TRADE_DATE, logger)
+
+
+class RollingExtremes:
+    """
+    Rolling highs and lows, with the dates they were made on, for any set of windows
+    over every symbol of a table (stocks by default), kept in ROLLING_EXTREMES_TABLE
+    with one row per (symbol, trade date, lookback window).
+
+    Windows are written as "<n>d" for the last n trading sessions, or "<n>w", "<n>m", "<n>y"
+    for the calendar span ending on the day, the same frame as the RANGE INTERVAL windows
+    of NiftyFiftyStocks.update_highs_and_lows.
+
+    The series are read once, ordered by symbol and date, as flat NumPy arrays, and each
+    window is computed van Herk/Gil-Werman style: the rows are cut into blocks, every
+    window is a suffix of the previous block plus a prefix of its own, and the running
+    maxima of the blocks from either end give the extreme of every row at once.
+    Time and memory are linear in the rows, whatever the window length. On ties the
+    latest date wins.
+    """
+
+    WINDOW_SPEC = re.compile(r"^(\d+)([dwmy])$")
+    SQL_UNITS = {"w": "WEEK", "m": "MONTH", "y": "YEAR"}
+
+    def __init__(self, con, table=ROLLING_EXTREMES_TABLE, chunk_rows=ROLLING_CHUNK_ROWS):
+        self.con = con
+        self.table = table
+        self.chunk_rows = chunk_rows
+        self._init_table()
+
+    def _init_table(self):
+        # no primary key: rows of a lookback are only ever replaced as a whole, and the
+        # index would make the bulk writes about ten times slower
+        create_table_query = f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                {SYMBOL.lower()} VARCHAR,
+                {TRADE_DATE.lower()} DATE,
+                lookback VARCHAR,
+                high DOUBLE,
+                high_date DATE,
+                low DOUBLE,
+                low_date DATE
+            )
+        """
+        self.con.execute(create_table_query)
+        logger.info("Ensured '%s' table exists", self.table)
+
+    @classmethod
+    def parse_window(cls, window):
+        """'20d' -> (20, 'd')"""
+        match = cls.WINDOW_SPEC.match(str(window).strip().lower())
+        if not match or int(match.group(1)) < 1:
+            raise ValueError(f"Invalid window {window!r}. Must be <n>d, <n>w, <n>m or <n>y with n >= 1.")
+        return int(match.group(1)), match.group(2)
+
+    def _read_series(self, source):
+        """(symbols, row counts, trade dates as days since epoch, highs, lows), ordered by symbol and date."""
+        groups = self.con.execute(f"""
+            SELECT {SYMBOL.lower()}, COUNT(*) AS row_count FROM {source} GROUP BY 1 ORDER BY 1
+        """).fetchnumpy()
+        series = self.con.execute(f"""
+            SELECT {TRADE_DATE.lower()}::DATE AS trade_date, high::DOUBLE AS high, low::DOUBLE AS low
+            FROM {source}
+            ORDER BY {SYMBOL.lower()}, {TRADE_DATE.lower()}
+        """).fetch_arrow_table()
+        days = series["trade_date"].cast(pa.int32()).to_numpy().astype(np.int64)
+        highs = series["high"].fill_null(np.nan).to_numpy()
+        lows = series["low"].fill_null(np.nan).to_numpy()
+        symbols = np.asarray(groups[SYMBOL.lower()], dtype=object)
+        counts = np.asarray(groups["row_count"], dtype=np.int64)
+        return symbols, counts, days, highs, lows
+
+    def _chunks(self, counts):
+        """(first group, end group) slices of whole symbols holding about chunk_rows rows each."""
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        start = 0
+        while start < len(counts):
+            end = int(np.searchsorted(bounds, bounds[start] + self.chunk_rows, side="right")) - 1
+            end = max(end, start + 1)
+            yield start, end
+            start = end
+
+    def _left_bounds(self, window, days, group_ids, group_starts):
+        """First row of each row's window, never before the first row of its symbol."""
+        n, unit = self.parse_window(window)
+        if unit == "d":
+            return np.maximum(np.arange(len(days)) - (n - 1), group_starts)
+
+        dates = pd.to_datetime(days, unit="D")
+        if unit == "w":
+            first_days = days - 7 * n
+        else:
+            offset = pd.DateOffset(months=n) if unit == "m" else pd.DateOffset(years=n)
+            first_days = ((dates - offset).values.astype("datetime64[D]")).astype(np.int64)
+        # rows are sorted by (symbol, date), so a combined key can be searched in one go
+        keys = (group_ids << 32) + (days + (1 << 31))
+        return np.searchsorted(keys, (group_ids << 32) + (first_days + (1 << 31)), side="left")
+
+    @staticmethod
+    def _block_starts(lefts):
+        """
+        First row of the block of every row. A block starts at the first row whose window no
+        longer reaches back to the start of the previous block, so a window either starts at
+        its own block's start or inside the previous block.
+        Window starts never decrease over a chunk (rows are ordered by symbol and date and
+        windows never reach before their symbol's first row), so the first row whose window
+        starts after row b is the number of windows starting at or before b, and only the
+        blocks are walked, not the rows.
+        """
+        n = len(lefts)
+        first_after = np.cumsum(np.bincount(lefts, minlength=n)[:n])
+        starts = []
+        start = 0
+        while start < n:
+            starts.append(start)
+            start = int(first_after[start])
+        starts = np.asarray(starts, dtype=np.int64)
+        return np.repeat(starts, np.diff(np.append(starts, n)))
+
+    @staticmethod
+    def _rolling_best(values, lefts):
+        """Position of the highest value in rows lefts .. row for every row, the latest one on ties."""
+        n = len(values)
+        rows = np.arange(n)
+        block_starts = RollingExtremes._block_starts(lefts)
+        block_ids = np.cumsum(rows == block_starts)
+
+        # running maximum from each block's start, and the row it was last reached on
+        prefix = pd.Series(values).groupby(block_ids).cummax().to_numpy()
+        prefix_rows = np.maximum.accumulate(np.where(values == prefix, rows, 0))
+
+        # running maximum from each block's end backwards, and the latest row holding it
+        reversed_values, reversed_ids = values[::-1], block_ids[::-1]
+        suffix = pd.Series(reversed_values).groupby(reversed_ids).cummax().to_numpy()
+        block_end = np.concatenate([[True], reversed_ids[1:] != reversed_ids[:-1]])
+        raised = block_end | (reversed_values > np.concatenate([[-np.inf], suffix[:-1]]))
+        suffix_rows = n - 1 - np.maximum.accumulate(np.where(raised, rows, 0))
+        suffix, suffix_rows = suffix[::-1], suffix_rows[::-1]
+
+        # rows from the own block are later, so they win ties
+        own_block = lefts == block_starts
+        return np.where(own_block | (prefix >= suffix[lefts]), prefix_rows, suffix_rows[lefts])
+
+    def extremes(self, source=STOCK_TABLE, windows=ROLLING_WINDOWS):
+        """
+        Yield the rolling extremes of `source` chunk by chunk as Arrow tables with
+        the columns of the rolling extremes table.
+        """
+        windows = [f"{n}{unit}" for n, unit in map(self.parse_window, windows)]
+        symbols, counts, days, highs, lows = self._read_series(source)
+        # NULL prices never win, as in SQL MAX/MIN
+        highs = np.where(np.isnan(highs), -np.inf, highs)
+        lows = np.where(np.isnan(lows), np.inf, lows)
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+
+        for first_group, end_group in self._chunks(counts):
+            start, end = bounds[first_group], bounds[end_group]
+            chunk_counts = counts[first_group:end_group]
+            group_ids = np.repeat(np.arange(len(chunk_counts), dtype=np.int64), chunk_counts)
+            group_starts = np.repeat(bounds[first_group:end_group] - start, chunk_counts)
+            chunk_days, chunk_highs, chunk_lows = days[start:end], highs[start:end], lows[start:end]
+
+            chunk_symbols = pa.array(np.repeat(symbols[first_group:end_group], chunk_counts), pa.string())
+            trade_dates = pa.array(chunk_days.astype(np.int32), pa.date32())
+            for window in windows:
+                lefts = self._left_bounds(window, chunk_days, group_ids, group_starts)
+                high_rows = self._rolling_best(chunk_highs, lefts)
+                low_rows = self._rolling_best(-chunk_lows, lefts)
+                high, low = chunk_highs[high_rows], chunk_lows[low_rows]
+                high_missing, low_missing = np.isinf(high), np.isinf(low)
+                yield pa.table({
+                    SYMBOL.lower(): chunk_symbols,
+                    TRADE_DATE.lower(): trade_dates,
+                    "lookback": pa.array(np.full(end - start, window), pa.string()),
+                    "high": pa.array(high, mask=high_missing),
+                    "high_date": pa.array(chunk_days[high_rows].astype(np.int32), pa.date32(), mask=high_missing),
+                    "low": pa.array(low, mask=low_missing),
+                    "low_date": pa.array(chunk_days[low_rows].astype(np.int32), pa.date32(), mask=low_missing),
+                })
+
+    def _replace(self, windows, insert):
+        """Replace the rows of `windows` in one transaction, `insert` writes the new ones."""
+        def replace():
+            self.con.execute(f"DELETE FROM {self.table} WHERE lookback IN (SELECT UNNEST(?::VARCHAR[]))", [windows])
+            insert()
+
+        run_in_transaction(self.con, replace)
+
+    def update(self, source=STOCK_TABLE, windows=ROLLING_WINDOWS):
+        """Recompute the given windows over every symbol of `source` and bulk-write them."""
+        windows = [f"{n}{unit}" for n, unit in map(self.parse_window, windows)]
+
+        def insert():
+            rows = 0
+            for batch in self.extremes(source, windows):
+                self.con.register("rolling_extremes_batch", batch)
+                try:
+                    self.con.execute(f"INSERT INTO {self.table} SELECT * FROM rolling_extremes_batch")
+                finally:
+                    self.con.unregister("rolling_extremes_batch")
+                rows += batch.num_rows
+            logger.info("Wrote %d rolling extremes of %s for windows %s", rows, source, windows)
+
+        self._replace(windows, insert)
+
+    def frame(self, window):
+        """SQL window frame equivalent to `window`."""
+        n, unit = self.parse_window(window)
+        if unit == "d":
+            return f"ROWS BETWEEN {n - 1} PRECEDING AND CURRENT ROW"
+        return f"RANGE BETWEEN INTERVAL {n} {self.SQL_UNITS[unit]} PRECEDING AND CURRENT ROW"
+
+    def update_sql(self, source=STOCK_TABLE, windows=ROLLING_WINDOWS):
+        """Same as update with DuckDB window functions, kept for comparison."""
+        windows = [f"{n}{unit}" for n, unit in map(self.parse_window, windows)]
+
+        def insert():
+            for window in windows:
+                self.con.execute(f"""
+                    INSERT INTO {self.table}
+                    SELECT {SYMBOL.lower()}, {TRADE_DATE.lower()}, '{window}',
+                           MAX(high) OVER w, ARG_MAX({TRADE_DATE.lower()}, high) OVER w,
+                           MIN(low) OVER w, ARG_MIN({TRADE_DATE.lower()}, low) OVER w
+                    FROM {source}
+                    WINDOW w AS (
+                        PARTITION BY {SYMBOL.lower()} ORDER BY {TRADE_DATE.lower()}
+                        {self.frame(window)}
+                    )
+                """)
+            logger.info("Wrote rolling extremes of %s for windows %s with SQL", source, windows)
+
+        self._replace(windows, insert)
@@ -0,0 +1,95 @@
+from constants import (NUMERIC_COLUMNS, ORDERED_CSV_COLUMNS, SYMBOL,
+                       TIMESTAMP_COLUMN, TRADE_DATE)
+
+
+class SqlCleaner:
+    """
+    SQL counterpart of Cleaner.
+    Builds DuckDB expressions that apply the same cleaning rules as Cleaner
+    so that a whole folder of CSVs can be cleaned inside a single query.
+    """
+
+    # column added by read_csv(..., filename=true)
+    FILENAME_COLUMN = "filename"
+
+    def string_expr(self, col):
+        """Trim and uppercase a string column, empty strings become NULL."""
+        return f"NULLIF(UPPER(TRIM(\"{col}\")), '')"
+
+    def numeric_expr(self, col, col_type):
+        """Strip commas and spaces, then cast; bad values become NULL."""
+        return (
+            f"TRY_CAST(NULLIF(REPLACE(REPLACE(TRIM(\"{col}\"), ',', ''), ' ', ''), '') AS {col_type})"
+        )
+
+    def timestamp_expr(self):
+        """
+        Trimmed TIMESTAMP, falling back to the date in the filename
+        (e.g. 20210623_xyz.csv -> 23-JUN-2021) when it is missing.
+        """
+        raw = f"CASE WHEN LOWER(TRIM(\"{TIMESTAMP_COLUMN}\")) NOT IN ('', 'nan') THEN TRIM(\"{TIMESTAMP_COLUMN}\") END"
+        from_filename = f"""
+            UPPER(STRFTIME(TRY_STRPTIME(
+                NULLIF(REGEXP_EXTRACT({self.FILENAME_COLUMN}, '(\\d{{8}})_[^/\\\\]*$', 1), ''),
+                '%Y%m%d'), '%d-%b-%Y'))
+        """
+        return f"COALESCE({raw}, {from_filename})"
+
+    def trade_date_expr(self, ts):
+        """
+        Parse a TIMESTAMP expression into a DATE.
+        Handles:
+            - '01-APR-2016'  -> %d-%b-%Y
+            - '2-Jun-25'     -> %d-%b-%y
+            - '45470'        -> Excel serial
+            - ISO dates via a plain cast
+        """
+        return f"""
+            CASE
+                WHEN REGEXP_FULL_MATCH({ts}, '\\d{{1,2}}-[A-Za-z]{{3}}-\\d{{4}}( .*)?')
+                    THEN CAST(TRY_STRPTIME({ts}, ['%d-%b-%Y', '%d-%b-%Y %H:%M:%S']) AS DATE)
+                WHEN REGEXP_FULL_MATCH({ts}, '\\d{{1,2}}-[A-Za-z]{{3}}-\\d{{2}}( .*)?')
+                    THEN CAST(TRY_STRPTIME({ts}, ['%d-%b-%y', '%d-%b-%y %H:%M:%S']) AS DATE)
+                WHEN REGEXP_FULL_MATCH({ts}, '\\d+(\\.0+)?')
+                    AND TRY_CAST({ts} AS DOUBLE) > 0 AND TRY_CAST({ts} AS DOUBLE) <= 60000
+                    THEN DATE '1899-12-30' + CAST(FLOOR(TRY_CAST({ts} AS DOUBLE)) AS INTEGER)
+                ELSE TRY_CAST({ts} AS DATE)
+            END
+        """
+
+    def cleaned_select(self, source, col_types):
+        """
+        SELECT over `source` (a read_csv(...) call or a table) returning the
+        ORDERED_CSV_COLUMNS cleaned and typed, plus the source filename.
+        """
+        expressions = []
+        for col in ORDERED_CSV_COLUMNS:
+            if col == TRADE_DATE:
+                continue
+            if col == TIMESTAMP_COLUMN:
+                expressions.append(f"{self.timestamp_expr()} AS {col}")
+            elif col in NUMERIC_COLUMNS:
+                expressions.append(f"{self.numeric_expr(col, col_types[col])} AS {col}")
+            else:
+                expressions.append(f"{self.string_expr(col)} AS {col}")
+        expressions.append(f"{self.FILENAME_COLUMN}")
+
+        return f"""
+            SELECT *, {self.trade_date_expr(TIMESTAMP_COLUMN)} AS {TRADE_DATE}
+            FROM (
+                SELECT {", ".join(expressions)}
+                FROM {source}
+            )
+        """
+
+    def reject_reason_expr(self):
+        """
+        Reason code for rows that cannot be loaded, NULL for good rows.
+        'nan' counts as missing in any case, as in Cleaner.drop_missing_pks.
+        """
+        return f"""
+            CASE
+                WHEN {SYMBOL} IS NULL OR LOWER({SYMBOL}) = 'nan' OR {TIMESTAMP_COLUMN} IS NULL THEN 'MISSING_PK'
+                WHEN {TRADE_DATE} IS NULL THEN 'INVALID_DATE'
+            END
+        """
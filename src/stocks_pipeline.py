@@ -1,18 +1,30 @@
 import os
+import zipfile
 import pandas as pd
 
 from cleaner import Cleaner
-from constants import (CSV_FOLDER, ERROR_LOG, 
+from rejected_rows import RejectedRows
+from sql_cleaner import SqlCleaner
+from duckdb_manager import run_in_transaction
+from constants import (CSV_FOLDER,
                        STAGING_TABLE, STOCK_TABLE, STOCK_TABLE_COL_TYPES,
                        SYMBOL, TIMESTAMP_COLUMN, logger, 
-                       ORDERED_CSV_COLUMNS, TRADE_DATE, CRAWLED_TILL_DATE_TABLE, LAST_CRAWLED_DATE)
-from datetime import datetime
+                       ORDERED_CSV_COLUMNS, TRADE_DATE, CRAWLED_TILL_DATE_TABLE, LAST_CRAWLED_DATE,
+                       LOAD_BATCH_SIZE, LOAD_BATCH_ROWS, CSV_CHUNK_SIZE, CSV_READ_DTYPES, ARROW_STAGING,
+                       NIFTY_FIFTY_SYNC_TABLE)
 
 
 class StocksPipeline:
-    def __init__(self, con):
+    def __init__(self, con, arrow_staging=ARROW_STAGING, rejected_rows=None):
+        """
+        arrow_staging=True hands cleaned data to DuckDB as Arrow tables instead of DataFrames.
+        Rows that cannot be loaded are quarantined in `rejected_rows` (a RejectedRows),
+        a new one with its own run id is created when not given.
+        """
         self.con = con
+        self.arrow_staging = arrow_staging
         self._init_table()
+        self.rejected_rows = rejected_rows or RejectedRows(con)
 
     def _init_table(self):
         columns = ",\n".join(
@@ -50,41 +62,356 @@ class StocksPipeline:
 
         return file_path
 
-    def read_from_csv(self, file_path):
+    @staticmethod
+    def csv_read_options(typed=True):
+        """
+        pd.read_csv options. typed=True reads every column straight to its final
+        type from STOCK_TABLE_COL_TYPES, typed=False reads text for Cleaner to convert.
+        """
+        if typed:
+            return {"dtype": CSV_READ_DTYPES, "thousands": ","}
+        return {"dtype": str}
+
+    @staticmethod
+    def read_from_csv(file_path, name=None, rejected_rows=None):
+        """
+        Read a CSV from a path or an open file object; `name` is used in logs for the latter.
+        A file that cannot be read is recorded in `rejected_rows`, if given: a RejectedRows,
+        or a Cleaner that keeps the error with its rejects (e.g. in a worker process).
+        """
+        name = name or file_path
         try:
-            df = pd.read_csv(file_path)
-            logger.info("Read %d records from %s", len(df), file_path)
+            try:
+                df = pd.read_csv(file_path, **StocksPipeline.csv_read_options())
+            except ValueError as e:
+                if isinstance(e, pd.errors.ParserError):
+                    raise
+                # a value that does not fit its column type, let Cleaner coerce it
+                logger.warning("Typed read of %s failed (%s), reading as text", name, e)
+                if hasattr(file_path, "seek"):
+                    file_path.seek(0)
+                df = pd.read_csv(file_path, **StocksPipeline.csv_read_options(typed=False))
+            logger.info("Read %d records from %s", len(df), name)
             return df
         except Exception as e:
-            logger.exception(f"Failed to read CSV {file_path} — logging as error")
-            err_row = {
-                "source_file": file_path,
-                "row_index": -1,
-                "error_reason": f"CSV_READ_ERROR: {e}",
-                "raw_timestamp": "",
-                "raw_row_json": "",
-                "execution_timestamp": datetime.now().isoformat()
-            }
-            pd.DataFrame([err_row]).to_csv(ERROR_LOG, index=False, mode="a", header=False)
+            logger.exception(f"Failed to read CSV {name} — logging as error")
+            if rejected_rows:
+                rejected_rows.insert_error(name, f"CSV_READ_ERROR: {e}")
             return pd.DataFrame()  # Return an empty DataFrame on error
 
-    def insert_into_stocks_db(self, filename):
+    def run_in_transaction(self, func, *args):
+        """Run func(*args) in one DuckDB transaction, see duckdb_manager.run_in_transaction."""
+        return run_in_transaction(self.con, func, *args)
+
+    def quarantine(self, rejected):
+        """
+        Store the (filename, reason, frame) rejects a Cleaner(None) collected, frame being None
+        for a file that could not be read. Called inside the load's transaction, so a file that
+        fails to load leaves no rejects behind.
+        """
+        for filename, reason, rejected_df in rejected:
+            if rejected_df is None:
+                self.rejected_rows.insert_error(filename, reason)
+            else:
+                self.rejected_rows.insert_frame(rejected_df, reason, filename)
+
+    def insert_into_stocks_db(self, filename, manifest=None):
         file_path = self._get_file_path(filename)
 
-        df = self.read_from_csv(file_path)
+        df = self.read_from_csv(file_path, rejected_rows=self.rejected_rows)
         if df.empty:
             logger.error("No valid data found in %s", filename)
             return False
 
         logger.info("Read %d records from %s", len(df), filename)
 
+        rows_read = len(df)
         cleaner = Cleaner()
-        cleaned_df = cleaner.clean(df, filename)
-        self.load_csv_to_staging(cleaned_df)
+        cleaned_df = cleaner.clean(df, filename, self.arrow_staging)
         logger.info("Cleaned data, %d records remain", len(cleaned_df))
-        self.upsert_into_main()
+
+        def load():
+            self.quarantine(cleaner.rejected)
+            self.load_csv_to_staging(cleaned_df)
+            merge_counts = self.merge_into_main()
+            if manifest:
+                manifest.record(filename, file_path, rows_read, len(cleaned_df), merge_counts.get(None))
+
+        self.run_in_transaction(load)
+        return True
+
+    def insert_into_stocks_db_chunked(self, filename, chunk_size=CSV_CHUNK_SIZE, manifest=None):
+        """
+        Stream one (possibly very large) CSV through clean, stage and merge
+        `chunk_size` rows at a time, so memory is bounded by the chunk size rather than the file.
+        Keys already seen in an earlier chunk are dropped, so the first row per
+        (SYMBOL, TRADE_DATE) wins across the whole file, as in insert_into_stocks_db.
+        The whole file is committed in one transaction.
+        """
+        file_path = self._get_file_path(filename)
+        seen_keys_table = f"{STAGING_TABLE}_seen_keys"
+        chunk_view = f"{STAGING_TABLE}_chunk"
+        totals = {"rows_read": 0, "rows_loaded": 0, "inserted": 0, "updated": 0, "skipped": 0}
+
+        def load(typed):
+            totals.update({key: 0 for key in totals})
+            self.con.execute(f"""
+                CREATE OR REPLACE TEMP TABLE {seen_keys_table} (
+                    {SYMBOL} VARCHAR, {TRADE_DATE} DATE, PRIMARY KEY ({SYMBOL}, {TRADE_DATE})
+                )
+            """)
+            read_options = self.csv_read_options(typed)
+            for chunk in pd.read_csv(file_path, chunksize=chunk_size, **read_options):
+                totals["rows_read"] += len(chunk)
+                cleaned_df = Cleaner(self.rejected_rows).clean(chunk, filename, self.arrow_staging)
+                del chunk
+
+                self._drop_staging()
+                self.con.register(chunk_view, cleaned_df)
+                self.con.execute(f"""
+                    CREATE TEMP TABLE {STAGING_TABLE} AS
+                    SELECT c.* FROM {chunk_view} c
+                    ANTI JOIN {seen_keys_table} k
+                        ON c.{SYMBOL} = k.{SYMBOL} AND c.{TRADE_DATE} = k.{TRADE_DATE}
+                """)
+                self.con.unregister(chunk_view)
+                del cleaned_df
+                self.con.execute(f"INSERT INTO {seen_keys_table} SELECT {SYMBOL}, {TRADE_DATE} FROM {STAGING_TABLE}")
+
+                counts = self.merge_into_main().get(None, dict())
+                for key, value in counts.items():
+                    totals[key] += value
+                totals["rows_loaded"] += sum(counts.values())
+                logger.info("Loaded chunk of %s, %d rows read so far", filename, totals["rows_read"])
+
+            self._drop_staging()
+            self.con.execute(f"DROP TABLE IF EXISTS {seen_keys_table}")
+            if manifest:
+                manifest.record(filename, file_path, totals["rows_read"], totals["rows_loaded"], totals)
+
+        try:
+            try:
+                self.run_in_transaction(load, True)
+            except ValueError as e:
+                if isinstance(e, pd.errors.ParserError):
+                    raise
+                logger.warning("Typed read of %s failed (%s), streaming it as text", filename, e)
+                self.run_in_transaction(load, False)
+        except pd.errors.ParserError as e:
+            logger.error("Failed to read CSV %s: %s", filename, e)
+            return False
+        logger.info("Streamed %s: %d rows read, %d loaded", filename, totals["rows_read"], totals["rows_loaded"])
         return True
-    
+
+    def insert_many_into_stocks_db(self, filenames, batch_files=LOAD_BATCH_SIZE,
+                                   batch_rows=LOAD_BATCH_ROWS, manifest=None):
+        """
+        Load files through Cleaner like insert_into_stocks_db, but stage them together
+        and upsert + commit once per batch of `batch_files` files or `batch_rows` rows,
+        whichever is reached first. Returns the names of the files loaded.
+        """
+        loaded_files = []
+        batch = []
+        rejected = []
+        rows_in_batch = 0
+        for filename in filenames:
+            file_path = self._get_file_path(filename)
+            df = self.read_from_csv(file_path, rejected_rows=self.rejected_rows)
+            if df.empty:
+                logger.error("No valid data found in %s", filename)
+                continue
+
+            cleaner = Cleaner()
+            cleaned_df = cleaner.clean(df, filename, self.arrow_staging)
+            batch.append((filename, file_path, len(df), cleaned_df))
+            rejected.append(cleaner.rejected)
+            rows_in_batch += len(cleaned_df)
+
+            if len(batch) >= batch_files or rows_in_batch >= batch_rows:
+                loaded_files.extend(self.write_batch(batch, manifest, rejected))
+                batch = []
+                rejected = []
+                rows_in_batch = 0
+
+        if batch:
+            loaded_files.extend(self.write_batch(batch, manifest, rejected))
+
+        logger.info("Batched load finished, %d of %d files loaded", len(loaded_files), len(filenames))
+        return loaded_files
+
+    def insert_from_zip(self, zip_path, manifest=None, overwrite=False, batch_files=LOAD_BATCH_SIZE):
+        """
+        Load the CSV members of a bhavcopy ZIP straight out of the archive,
+        without extracting them to CSV_FOLDER first.
+        Members are committed `batch_files` at a time and recorded in the manifest
+        as '<archive>/<member>'. Returns the names of the members loaded.
+        """
+        archive_name = os.path.basename(zip_path)
+        loaded_members = []
+        batch = []
+        rejected = []
+        with zipfile.ZipFile(zip_path) as zf:
+            members = [info for info in zf.infolist() if info.filename.lower().endswith(".csv")]
+            if manifest:
+                members = manifest.members_to_load(archive_name, members, overwrite)
+
+            for info in members:
+                cleaner = Cleaner()
+                entry = self.read_zip_member(zf, info, archive_name, cleaner, self.rejected_rows)
+                if entry is None:
+                    continue
+                batch.append(entry)
+                rejected.append(cleaner.rejected)
+                if len(batch) >= batch_files:
+                    loaded_members.extend(self.write_batch(batch, manifest, rejected))
+                    batch = []
+                    rejected = []
+
+        if batch:
+            loaded_members.extend(self.write_batch(batch, manifest, rejected))
+        logger.info("Loaded %d CSVs from %s", len(loaded_members), archive_name)
+        return loaded_members
+
+    def read_zip_member(self, zf, info, archive_name, cleaner, rejected_rows=None):
+        """
+        Read and clean one CSV member of an open archive with `cleaner`.
+        Returns a write_batch entry ('<archive>/<member>', info, rows_read, frame),
+        or None if the member has no data.
+        """
+        member_name = f"{archive_name}/{info.filename}"
+        with zf.open(info) as f:
+            df = self.read_from_csv(f, name=member_name, rejected_rows=rejected_rows)
+        if df.empty:
+            logger.error("No valid data found in %s", member_name)
+            return None
+
+        # Cleaner takes the trade date fallback from the member's own file name
+        cleaned_df = cleaner.clean(df, os.path.basename(info.filename), self.arrow_staging)
+        return member_name, info, len(df), cleaned_df
+
+    def write_batch(self, batch, manifest=None, rejected=None, errors=None):
+        """
+        Upsert a batch of cleaned files in one transaction.
+        `batch` holds (filename, source, rows_read, frame) tuples, source being the file
+        path or ZipInfo it came from and frame a DataFrame or an Arrow table. If the batch fails it is rolled back and retried
+        file by file, so one bad file does not hold back the rest.
+        `rejected` holds the Cleaner rejects of each file, in batch order; they are
+        quarantined in the same transaction as the file's rows. `errors` holds the rejects of
+        files read along with the batch that could not be read at all, quarantined with it too
+        (or on their own if the batch fails).
+        Returns the names of the files loaded.
+        """
+        rejected = rejected or [[] for _ in batch]
+        if not batch:
+            if errors:
+                self.run_in_transaction(self.quarantine, errors)
+            return []
+
+        def write(entries, entries_rejected, entries_errors=()):
+            self.quarantine(entries_errors)
+            for file_rejected in entries_rejected:
+                self.quarantine(file_rejected)
+            self.load_batch_to_staging([frame for _, _, _, frame in entries])
+            merge_counts = self.merge_into_main(group_column="batch_seq")
+            if manifest:
+                for i, (filename, source, rows_read, frame) in enumerate(entries):
+                    manifest.record(filename, source, rows_read, len(frame), merge_counts.get(i))
+
+        try:
+            self.run_in_transaction(write, batch, rejected, errors or [])
+            logger.info("Committed batch of %d files", len(batch))
+            return [filename for filename, _, _, _ in batch]
+        except Exception as e:
+            if errors:
+                self.run_in_transaction(self.quarantine, errors)
+            if len(batch) == 1:
+                logger.error("Failed to load %s: %s", batch[0][0], e)
+                return []
+            logger.warning("Batch of %d files failed (%s), retrying file by file", len(batch), e)
+
+        loaded_files = []
+        for entry, file_rejected in zip(batch, rejected):
+            loaded_files.extend(self.write_batch([entry], manifest, [file_rejected]))
+        return loaded_files
+
+    def bulk_insert_into_stocks_db(self, filenames, manifest=None):
+        """
+        Load many CSVs with a single DuckDB read_csv over all of them.
+        Cleaning happens in SQL (see SqlCleaner) and the result is upserted
+        into the main table in one set-based statement.
+        Rows that cannot be loaded are quarantined in the rejected rows table,
+        in the same transaction as the upsert.
+        """
+        if not filenames:
+            logger.info("No files to bulk load")
+            return 0
+
+        file_paths = {f: self._get_file_path(f) for f in filenames}
+        file_list = ", ".join(["'{}'".format(p.replace("'", "''")) for p in file_paths.values()])
+        source = f"""read_csv([{file_list}], header=true, all_varchar=true,
+                             union_by_name=true, filename=true)"""
+
+        sql_cleaner = SqlCleaner()
+        cleaned_table = f"{STAGING_TABLE}_cleaned"
+        self.con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE {cleaned_table} AS
+            SELECT *, {sql_cleaner.reject_reason_expr()} AS error_reason
+            FROM ({sql_cleaner.cleaned_select(source, STOCK_TABLE_COL_TYPES)})
+        """)
+
+        staged = self.run_in_transaction(self._bulk_upsert, cleaned_table, file_paths, manifest)
+        logger.info("Bulk loaded %d files, %d records staged", len(filenames), staged)
+
+        self._drop_staging()
+        self.con.execute(f"DROP TABLE IF EXISTS {cleaned_table}")
+        return staged
+
+    def _bulk_upsert(self, cleaned_table, file_paths, manifest):
+        sql_cleaner = SqlCleaner()
+        # rows of the cleaned table keep the read order (CREATE TABLE AS preserves insertion order),
+        # so a row's position within its file is its rowid less the file's first rowid
+        self.rejected_rows.insert_query(f"""
+            SELECT
+                parse_filename({sql_cleaner.FILENAME_COLUMN}) AS source_file,
+                row_index,
+                error_reason,
+                {TIMESTAMP_COLUMN} AS raw_timestamp,
+                to_json(struct_pack(*COLUMNS(* EXCLUDE ({sql_cleaner.FILENAME_COLUMN}, {TRADE_DATE}, error_reason, row_index)))) AS raw_row_json
+            FROM (
+                SELECT *, rowid - MIN(rowid) OVER (PARTITION BY {sql_cleaner.FILENAME_COLUMN}) AS row_index
+                FROM {cleaned_table}
+            )
+            WHERE error_reason IS NOT NULL
+        """)
+        self._drop_staging()
+        # same (SYMBOL, TRADE_DATE) in several files: the last file wins,
+        # within a file the first row wins, as with the per-file path;
+        # rowid follows the file order, as above
+        self.con.execute(f"""
+            CREATE TEMP TABLE {STAGING_TABLE} AS
+            SELECT * FROM {cleaned_table}
+            WHERE error_reason IS NULL
+            QUALIFY row_number() OVER (
+                PARTITION BY {SYMBOL}, {TRADE_DATE}
+                ORDER BY {sql_cleaner.FILENAME_COLUMN} DESC, rowid
+            ) = 1
+        """)
+        staged = self.con.execute(f"SELECT COUNT(*) FROM {STAGING_TABLE}").fetchone()[0]
+        merge_counts = self.merge_into_main(group_column=sql_cleaner.FILENAME_COLUMN)
+
+        if manifest:
+            counts = self.con.execute(f"""
+                SELECT {sql_cleaner.FILENAME_COLUMN}, COUNT(*),
+                       COUNT(DISTINCT ({SYMBOL}, {TRADE_DATE})) FILTER (WHERE error_reason IS NULL)
+                FROM {cleaned_table}
+                GROUP BY {sql_cleaner.FILENAME_COLUMN}
+            """).fetchall()
+            counts = {file_path: (rows_read, rows_loaded) for file_path, rows_read, rows_loaded in counts}
+            for filename, file_path in file_paths.items():
+                rows_read, rows_loaded = counts.get(file_path, (0, 0))
+                manifest.record(filename, file_path, rows_read, rows_loaded, merge_counts.get(file_path))
+        return staged
+
     def print_staging_data(self, limit=5):
         """Prints the first few rows of the staging table for inspection."""
         try:
@@ -95,17 +422,52 @@ class StocksPipeline:
         except Exception as e:
             logger.error("Failed to print staging data: %s", e)
 
-    def load_csv_to_staging(self, df):
+    def _drop_staging(self):
+        """Drop the staging table or view, whichever the previous load left behind."""
+        is_table = self.con.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [STAGING_TABLE]
+        ).fetchone()[0]
+        if is_table:
+            self.con.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+        else:
+            self.con.execute(f"DROP VIEW IF EXISTS {STAGING_TABLE}")
 
-        df[SYMBOL] = df[SYMBOL].str.strip().str.upper()
+    def load_csv_to_staging(self, df):
+        """Register a cleaned DataFrame or Arrow table as the staging view."""
+        if isinstance(df, pd.DataFrame):
+            df[SYMBOL] = df[SYMBOL].str.strip().str.upper()
 
-        self.con.execute(f"DROP VIEW IF EXISTS {STAGING_TABLE}")
-        self.con.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+        self._drop_staging()
 
         self.con.register(f"{STAGING_TABLE}", df)
 
         logger.info("Loaded data into staging table")
 
+    def load_batch_to_staging(self, frames):
+        """
+        Stage several cleaned files (pandas DataFrames or Arrow tables) at once.
+        When a (SYMBOL, TRADE_DATE) appears in more than one of them the last one wins,
+        the same as loading them one after another.
+        """
+        self._drop_staging()
+
+        parts = []
+        for i, frame in enumerate(frames):
+            self.con.register(f"{STAGING_TABLE}_part_{i}", frame)
+            parts.append(f"SELECT *, {i} AS batch_seq FROM {STAGING_TABLE}_part_{i}")
+
+        self.con.execute(f"""
+            CREATE TEMP TABLE {STAGING_TABLE} AS
+            SELECT * FROM ({" UNION ALL BY NAME ".join(parts)})
+            QUALIFY row_number() OVER (
+                PARTITION BY {SYMBOL}, {TRADE_DATE} ORDER BY batch_seq DESC
+            ) = 1
+        """)
+
+        for i in range(len(frames)):
+            self.con.unregister(f"{STAGING_TABLE}_part_{i}")
+        logger.info("Loaded %d files into staging table", len(frames))
+
     def upsert_into_main(self):
         """Insert only new records into the main table"""
         logger.info("Upserting data into 'stocks' table...")
@@ -134,6 +496,104 @@ class StocksPipeline:
 
         logger.info("Upsert completed successfully!")
 
+    def merge_into_main(self, group_column=None):
+        """
+        Change-aware alternative to upsert_into_main.
+        Staging rows are split into new keys, keys whose values changed (any non-key column,
+        cast to its table type, distinct from the stored one) and identical rows; only the
+        first two touch the table.
+        Returns {group: {"inserted": n, "updated": n, "skipped": n}} where group is the
+        value of `group_column` in staging (e.g. the source file), or None if not given.
+        """
+        logger.info("Merging data into 'stocks' table...")
+
+        key_columns = [SYMBOL.lower(), TRADE_DATE.lower()]
+        insert_columns = ", ".join([c.lower() for c in ORDERED_CSV_COLUMNS])
+        value_columns = [c.lower() for c in ORDERED_CSV_COLUMNS if c not in [SYMBOL, TRADE_DATE]]
+        # staged columns are cast first: a text-read file stages int64 prices, and 1 <> 1.0 by hash
+        changed = " OR ".join([
+            f"CAST(s.{col.lower()} AS {STOCK_TABLE_COL_TYPES[col]}) IS DISTINCT FROM m.{col.lower()}"
+            for col in ORDERED_CSV_COLUMNS if col not in [SYMBOL, TRADE_DATE]
+        ])
+        join_clause = " AND ".join([f"m.{col} = s.{col}" for col in key_columns])
+        group_expr = f"s.{group_column}" if group_column else "NULL"
+        merge_table = f"{STAGING_TABLE}_merge"
+
+        try:
+            self.con.execute(f"""
+                CREATE OR REPLACE TEMP TABLE {merge_table} AS
+                SELECT
+                    s.*,
+                    {group_expr} AS merge_group,
+                    CASE
+                        WHEN m.{SYMBOL.lower()} IS NULL THEN 'inserted'
+                        WHEN {changed} THEN 'updated'
+                        ELSE 'skipped'
+                    END AS merge_action
+                FROM {STAGING_TABLE} s
+                LEFT JOIN {STOCK_TABLE} m ON {join_clause}
+            """)
+
+            self.con.execute(f"""
+                INSERT INTO {STOCK_TABLE} ({insert_columns})
+                SELECT {insert_columns} FROM {merge_table}
+                WHERE merge_action = 'inserted'
+            """)
+            self.mark_nifty_fifty_dirty(merge_table)
+
+            set_clause = ",\n".join([f"{col} = s.{col}" for col in value_columns])
+            self.con.execute(f"""
+                UPDATE {STOCK_TABLE} AS m
+                SET {set_clause}
+                FROM {merge_table} s
+                WHERE {join_clause}
+                  AND s.merge_action = 'updated'
+            """)
+
+            counts = self.con.execute(f"""
+                SELECT merge_group, merge_action, COUNT(*)
+                FROM {merge_table}
+                GROUP BY merge_group, merge_action
+            """).fetchall()
+        except Exception as e:
+            logger.error("Failed to merge data into 'stocks' table: %s", e)
+            raise Exception(f"Merge failed: {e}")
+        finally:
+            self.con.execute(f"DROP TABLE IF EXISTS {merge_table}")
+
+        merge_counts = dict()
+        for group, action, count in counts:
+            merge_counts.setdefault(group, {"inserted": 0, "updated": 0, "skipped": 0})[action] = count
+        for group, group_counts in merge_counts.items():
+            logger.info("Merged %s: %d inserted, %d updated, %d skipped", group or STAGING_TABLE,
+                        group_counts["inserted"], group_counts["updated"], group_counts["skipped"])
+        return merge_counts
+
+    def mark_nifty_fifty_dirty(self, merge_table):
+        """
+        Move the dirty_since of synced symbols back to the earliest row the merge inserted at or
+        before their synced_till, so that NiftyFiftyStocks.sync_nifty_fifty copies it next time.
+        Rows after synced_till are synced anyway; nothing to do before the first sync.
+        """
+        has_column = self.con.execute("""
+            SELECT COUNT(*) FROM duckdb_columns()
+            WHERE table_name = ? AND column_name = 'dirty_since'
+        """, [NIFTY_FIFTY_SYNC_TABLE]).fetchone()[0]
+        if not has_column:
+            return
+        self.con.execute(f"""
+            UPDATE {NIFTY_FIFTY_SYNC_TABLE} AS w
+            SET dirty_since = LEAST(COALESCE(w.dirty_since, d.first_date), d.first_date)
+            FROM (
+                SELECT s.{SYMBOL.lower()} AS symbol, MIN(s.{TRADE_DATE.lower()}) AS first_date
+                FROM {merge_table} s
+                JOIN {NIFTY_FIFTY_SYNC_TABLE} w ON w.{SYMBOL} = s.{SYMBOL.lower()}
+                WHERE s.merge_action = 'inserted' AND s.{TRADE_DATE.lower()} <= w.synced_till
+                GROUP BY s.{SYMBOL.lower()}
+            ) AS d
+            WHERE w.{SYMBOL} = d.symbol
+        """)
+
     def update_the_crawled_till_date(self):
         """Update the CRAWLED_TILL_DATE_TABLE with the latest trade date from the stocks table."""
         try:
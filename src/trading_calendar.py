@@ -0,0 +1,75 @@
+import os
+
+import pandas as pd
+
+from constants import HOLIDAYS_FILE, STOCK_TABLE, TRADE_DATE, logger
+
+
+class TradingCalendar:
+    """
+    Exchange trading days: weekdays that are not in the local holiday list (HOLIDAYS_FILE).
+    Used to work out which days are missing from the stocks table, so the crawler
+    asks only for those and never for weekends or holidays.
+    """
+
+    def __init__(self, holidays_file=HOLIDAYS_FILE):
+        self.holidays_file = holidays_file
+        self.holidays = self._read_holidays()
+
+    def _read_holidays(self):
+        if not os.path.exists(self.holidays_file):
+            logger.warning("Holiday list %s not found, treating every weekday as a trading day",
+                           self.holidays_file)
+            return set()
+        df = pd.read_csv(self.holidays_file)
+        return set(pd.to_datetime(df["date"], format="mixed", dayfirst=True).dt.date)
+
+    def add_holidays(self, days):
+        """Add days to the holiday list, e.g. weekdays for which no bhavcopy was ever published."""
+        new_days = set(days) - self.holidays
+        if not new_days:
+            return
+        self.holidays |= new_days
+        os.makedirs(os.path.dirname(self.holidays_file) or ".", exist_ok=True)
+        pd.DataFrame({"date": sorted(self.holidays)}).to_csv(self.holidays_file, index=False)
+        logger.info("Added %d days to %s", len(new_days), self.holidays_file)
+
+    def trading_days(self, from_date, to_date):
+        """Trading days from from_date to to_date, both included."""
+        return [d.date() for d in pd.bdate_range(from_date, to_date, freq="C", holidays=sorted(self.holidays))]
+
+    def missing_ranges(self, con, from_date=None, to_date=None):
+        """
+        The trading days between from_date (default: the first trade date in stocks) and
+        to_date (default: today) that have no rows in stocks, as a minimal list of
+        (start, end) ranges. Missing days separated only by weekends or holidays
+        fall into the same range.
+        """
+        if from_date is None:
+            from_date = con.execute(f"SELECT MIN({TRADE_DATE.lower()}) FROM {STOCK_TABLE}").fetchone()[0]
+            if from_date is None:
+                return []
+        to_date = to_date or pd.Timestamp.now().date()
+
+        calendar = pd.DataFrame({"day": self.trading_days(from_date, to_date)})
+        calendar["day_seq"] = range(len(calendar))
+        con.register("trading_calendar", calendar)
+        try:
+            # gaps and islands: consecutive missing trading days share day_seq - row_number()
+            ranges = con.execute(f"""
+                SELECT MIN(day), MAX(day), COUNT(*)
+                FROM (
+                    SELECT day, day_seq - row_number() OVER (ORDER BY day_seq) AS island
+                    FROM trading_calendar c
+                    ANTI JOIN (SELECT DISTINCT {TRADE_DATE.lower()} AS day FROM {STOCK_TABLE}) s
+                        ON c.day = s.day
+                )
+                GROUP BY island
+                ORDER BY 1
+            """).fetchall()
+        finally:
+            con.unregister("trading_calendar")
+
+        logger.info("%d trading days missing from %s in %d ranges",
+                    sum(days for _, _, days in ranges), STOCK_TABLE, len(ranges))
+        return [(start, end) for start, end, _ in ranges]